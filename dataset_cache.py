@@ -0,0 +1,196 @@
+"""
+Sharded on-disk cache of encoded training decisions.
+
+build() encodes every .phhs file of a corpus directory into its own shard, one
+.npy file per column (the compact features.py encoding, cards int8 (N, 7) and
+feats float32 (N, 4), plus y int8 labels), and records each source file's size,
+mtime and SHA-1 in manifest.json. Rebuilding re-encodes only files that are new
+or whose content changed, on a process pool, and deletes the files of shards
+whose source file is gone and the columns of older formats. Training opens the shards memory-mapped (open_shards / iter_batches,
+or input_pipeline.py for tf.data), so start-up does not parse anything and the
+full matrix never has to sit in RAM.
+
+    python dataset_cache.py /path/to/handhq/dir [cache_dir]
+"""
+from collections import namedtuple
+import hashlib
+import json
+import multiprocessing as mp
+import os
+import sys
+import time
+
+import numpy as np
+
+import features
+import phh_parser
+from simple_model import encode_section
+
+FORMAT_VERSION = 2
+COLUMNS = ('cards', 'feats', 'y')
+MANIFEST = 'manifest.json'
+CACHE_DIR = 'encoded_cache'
+
+Shard = namedtuple('Shard', ['name', 'cards', 'feats', 'y'])
+
+def file_hash(path):
+    h = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            h.update(block)
+    return h.hexdigest()
+
+def _column_path(cache_dir, name, column):
+    return os.path.join(cache_dir, f'{name}.{column}.npy')
+
+def _save_atomic(path, array):
+    tmp = path + '.tmp.npy'
+    np.save(tmp, array)
+    os.replace(tmp, path)
+
+def encode_file(path):
+    '''
+    Encoded columns of every decision in a .phhs file, keyed by COLUMNS.
+    '''
+    parts = [encode_section(sec) for sec in phh_parser.iter_sections(path)]
+    if not parts:
+        return {'cards': np.zeros((0, features.CARD_SLOTS), dtype=np.int8),
+                'feats': np.zeros((0, features.NUM_FEATS), dtype=np.float32),
+                'y': np.zeros(0, dtype=np.int8)}
+    return {column: np.concatenate(arrays) for column, arrays in zip(COLUMNS, zip(*parts))}
+
+def _build_shard(args):
+    path, cache_dir, digest = args
+    name = os.path.basename(path)
+    columns = encode_file(path)
+    for column in COLUMNS:
+        _save_atomic(_column_path(cache_dir, name, column), columns[column])
+    return name, len(columns['y']), digest
+
+def load_manifest(cache_dir):
+    try:
+        with open(os.path.join(cache_dir, MANIFEST)) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {'version': FORMAT_VERSION, 'shards': {}}
+    if manifest.get('version') != FORMAT_VERSION:
+        return {'version': FORMAT_VERSION, 'shards': {}}
+    return manifest
+
+def _shard_complete(cache_dir, name):
+    return all(os.path.exists(_column_path(cache_dir, name, c)) for c in COLUMNS)
+
+def _remove_stale(cache_dir, shards, suffix):
+    # column files of dropped shards, and of columns an older FORMAT_VERSION wrote (v1 had X.npy)
+    for fname in os.listdir(cache_dir):
+        if not fname.endswith('.npy'):
+            continue
+        name, _, column = fname[:-len('.npy')].rpartition('.')
+        if name.endswith(suffix) and (name not in shards or column not in COLUMNS):
+            os.remove(os.path.join(cache_dir, fname))
+
+def build(source_dir, cache_dir=CACHE_DIR, processes=None, suffix='.phhs'):
+    '''
+    Bring the cache in cache_dir up to date with the .phhs files in source_dir and
+    return (built, kept, removed) shard counts. A file whose size and mtime match
+    the manifest is kept without reading it; otherwise its SHA-1 decides whether
+    it is re-encoded.
+    '''
+    os.makedirs(cache_dir, exist_ok=True)
+    manifest = load_manifest(cache_dir)
+    old = manifest['shards']
+    shards, tasks = {}, []
+    for path in phh_parser.list_files(source_dir, suffix):
+        name = os.path.basename(path)
+        st = os.stat(path)
+        entry = old.get(name)
+        stat = {'size': st.st_size, 'mtime_ns': st.st_mtime_ns}
+        if entry is not None and _shard_complete(cache_dir, name):
+            if entry['size'] == st.st_size and entry['mtime_ns'] == st.st_mtime_ns:
+                shards[name] = entry
+                continue
+            digest = file_hash(path)
+            if digest == entry['sha1']:
+                shards[name] = dict(entry, **stat)  # touched but unchanged
+                continue
+        else:
+            digest = file_hash(path)
+        shards[name] = dict(stat, sha1=digest)
+        tasks.append((path, cache_dir, digest))
+    if tasks:
+        with mp.Pool(min(processes or os.cpu_count() or 1, len(tasks))) as pool:
+            for name, rows, digest in pool.imap_unordered(_build_shard, tasks):
+                shards[name]['rows'] = rows
+    removed = [name for name in old if name not in shards]
+    _remove_stale(cache_dir, shards, suffix)
+    manifest = {'version': FORMAT_VERSION, 'source_dir': os.path.abspath(source_dir),
+                'shards': dict(sorted(shards.items()))}
+    tmp = os.path.join(cache_dir, MANIFEST + '.tmp')
+    with open(tmp, 'w') as f:
+        json.dump(manifest, f, indent=1)
+    os.replace(tmp, os.path.join(cache_dir, MANIFEST))
+    return len(tasks), len(shards) - len(tasks), len(removed)
+
+def open_shards(cache_dir=CACHE_DIR):
+    '''
+    Every shard in the manifest with its columns memory-mapped read-only.
+    '''
+    manifest = load_manifest(cache_dir)
+    return [Shard(name, *(np.load(_column_path(cache_dir, name, c), mmap_mode='r') for c in COLUMNS))
+            for name in manifest['shards']]
+
+def num_rows(shards):
+    return sum(len(s.y) for s in shards)
+
+def split_shards(shards, val_fraction=0.2):
+    '''
+    (train, val) shard lists. A shard's side is decided by a hash of its file
+    name, so the split is the same every epoch and every run, and adding files to
+    the corpus never moves an existing file between train and val. The exception
+    is a corpus too small for the hash to give each side a shard: with two or
+    more shards (and 0 < val_fraction < 1) the shard hashing closest to the empty
+    side moves over.
+    '''
+    train, val = [], []
+    for shard in shards:
+        (val if _split_hash(shard) < val_fraction else train).append(shard)
+    if len(shards) >= 2 and not val and val_fraction > 0:
+        val.append(train.pop(train.index(min(train, key=_split_hash))))
+    elif len(shards) >= 2 and not train and val_fraction < 1:
+        train.append(val.pop(val.index(max(val, key=_split_hash))))
+    return train, val
+
+def _split_hash(shard):
+    return int(hashlib.sha1(shard.name.encode()).hexdigest()[:8], 16) / 2 ** 32
+
+def iter_shard(shard, batch_size=128, shuffle=True, rng=None):
+    '''
+    ((cards, feats), y) batches of one memory-mapped shard. With shuffle the rows
+    are permuted, and each batch is gathered in ascending row order to keep reads
+    sequential.
+    '''
+    n = len(shard.y)
+    rows = (rng or np.random.default_rng()).permutation(n) if shuffle else np.arange(n)
+    for start in range(0, n, batch_size):
+        idx = np.sort(rows[start:start + batch_size])
+        yield (np.asarray(shard.cards[idx]), np.asarray(shard.feats[idx])), np.asarray(shard.y[idx])
+
+def iter_batches(shards, batch_size=128, shuffle=True, seed=None):
+    '''
+    iter_shard over every shard, in a random shard order with shuffle; rows of a
+    batch come from one shard.
+    '''
+    rng = np.random.default_rng(seed)
+    order = rng.permutation(len(shards)) if shuffle else range(len(shards))
+    for i in order:
+        yield from iter_shard(shards[i], batch_size, shuffle, rng)
+
+if __name__ == '__main__':
+    source_dir = sys.argv[1]
+    cache_dir = sys.argv[2] if len(sys.argv) > 2 else CACHE_DIR
+    start = time.perf_counter()
+    built, kept, removed = build(source_dir, cache_dir)
+    elapsed = time.perf_counter() - start
+    shards = open_shards(cache_dir)
+    print(f"{built} shards built, {kept} kept, {removed} removed in {elapsed:.2f}s; "
+          f"{num_rows(shards)} decisions in {len(shards)} shards")
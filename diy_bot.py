@@ -2,7 +2,11 @@
 Minimal six-max no-limit Hold'em simulator and baseline bot using only Treys for hand evaluation.
 """
 import random
-from treys import Deck, Evaluator, Card
+from treys import Deck, Card
+import equity_cache
+import hand_eval
+import equity_pool
+import preflop_table
 
 # Game constants
 SMALL_BLIND = 5
@@ -53,13 +57,18 @@ class RandomPlayer(Player):
         return 'raise', raise_amt
 
 class BaselineBot(Player):
-    def __init__(self, name):
+    def __init__(self, name, equity_mode='serial', equity_sampler='iid'):
         super().__init__(name)
-        self.evaluator = Evaluator()
+        # 'parallel' splits equity sims across the shared equity_pool worker processes
+        self.equity_pool = equity_pool.pool_for_mode(equity_mode)
+        # one of equity.SAMPLERS
+        self.equity_sampler = equity_sampler
 
     def decide(self, valid_actions, hole, board, pot, to_call):
-        # estimate equity
-        eq = self.estimate_equity(hole, board)
+        # estimate equity; calling breaks even at to_call / (pot + 2*to_call),
+        # raising beats calling above 0.5
+        thresholds = [0.5] + ([to_call / (pot + 2 * to_call)] if to_call > 0 else [])
+        eq = self.estimate_equity(hole, board, thresholds)
         # compute simple EVs
         ev_fold = 0
         winning_odds, losing_odds = eq, 1 - eq
@@ -69,7 +78,7 @@ class BaselineBot(Player):
         Card.print_pretty_cards(board)
         raise_amt = min(self.stack, to_call + BIG_BLIND)
         ev_raise = eq * (pot + raise_amt) - (1 - eq) * raise_amt
-        print(f"  equity = {eq:.2f}, ev_call = {ev_call:.2f}, to_call = {to_call}, ev_raise = {ev_raise:.2f}, raise_amt = {raise_amt}")
+        print(f"  equity = {eq:.2f} ({self.last_sims} sims), ev_call = {ev_call:.2f}, to_call = {to_call}, ev_raise = {ev_raise:.2f}, raise_amt = {raise_amt}")
         # choose best
         if ev_raise >= ev_call and ev_raise >= ev_fold:
             print(f"  raise {raise_amt}")
@@ -83,33 +92,17 @@ class BaselineBot(Player):
         print("  fold")
         return 'fold', 0
 
-    def estimate_equity(self, hole, board):
-        wins = ties = 0
-        for _ in range(MC_SIMS):
-            deck = Deck()
-            deck.shuffle()
-            # remove known cards
-            for c in hole + board:
-                deck.cards.remove(c)
-            # deal opponents
-            opps = [deck.draw(2) for _ in range(NUM_OPPONENTS)]
-            # deal remaining community
-            future = deck.draw(5 - len(board))
-            future_strs = [Card.int_to_str(c) for c in future]
-            full_board = board + future
-            try:
-                my_score = self.evaluator.evaluate(hole, full_board)
-            except KeyError as e:
-                print("  hole     =", [Card.int_to_str(c) for c in hole])
-                print("  full_board =", [Card.int_to_str(c) for c in full_board])
-                raise
-            opp_scores = [self.evaluator.evaluate(h, full_board) for h in opps]
-            best_opp = min(opp_scores)
-            if my_score < best_opp:
-                wins += 1
-            elif my_score == best_opp:
-                ties += 1
-        return (wins + ties / 2) / MC_SIMS
+    def estimate_equity(self, hole, board, thresholds=None):
+        # thresholds: equities the decision hinges on; sampling stops once they are cleared
+        self.last_sims = 0
+        if not board:
+            eq = preflop_table.preflop_equity(hole, NUM_OPPONENTS)
+            if eq is not None:
+                return eq
+        res = equity_cache.cached_equity(hole, board, NUM_OPPONENTS, MC_SIMS, thresholds, self.equity_pool,
+                                         sampler=self.equity_sampler)
+        self.last_sims = res.num_sims
+        return res.equity
 
 class Game:
     def __init__(self, players):
@@ -119,11 +112,12 @@ class Game:
     def rotate_dealer(self):
         self.dealer_idx = (self.dealer_idx + 1) % NUM_PLAYERS
 
-    def play_hand(self):
-        # reset
+    def play_hand(self, deck=None):
+        # reset; a preset deck replays a known deal
         for p in self.players: p.reset_hand()
-        deck = Deck()
-        deck.shuffle()
+        if deck is None:
+            deck = Deck()
+            deck.shuffle()
         # post blinds
         sb = self.players[(self.dealer_idx + 1) % NUM_PLAYERS].post_blind(SMALL_BLIND)
         bb = self.players[(self.dealer_idx + 2) % NUM_PLAYERS].post_blind(BIG_BLIND)
@@ -156,8 +150,7 @@ class Game:
         remaining = [p for p in self.players if p.in_hand]
         if not remaining:
             return  # everyone folded
-        evaluator = Evaluator()
-        scores = {p: evaluator.evaluate(p.hole, board) for p in remaining}
+        scores = {p: hand_eval.evaluate(p.hole, board) for p in remaining}
         winner = min(scores, key=scores.get)
         winner.stack += pot
 
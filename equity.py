@@ -0,0 +1,418 @@
+"""
+Vectorized Monte Carlo equity engine shared by the bots in ppe_bot.py and diy_bot.py.
+
+All runouts for a decision are drawn as one index array and every hand (hero and
+opponents, every runout) is scored in a single hand_eval.evaluate_batch call.
+Besides plain i.i.d. deals, sampled estimates can use stratified, antithetic or
+quasi-random deals (see SAMPLERS and sample_groups).
+"""
+from collections import namedtuple
+import itertools
+from math import comb, erf, factorial, inf, pi, sqrt, tan
+import time
+
+import numpy as np
+from treys import Card
+
+import hand_eval
+# card conventions live with the evaluator; re-exported for the rest of the bots
+from hand_eval import RANKS, SUITS, ALL_CARDS, INDEX_TO_TREYS, TREYS_TO_INDEX, treys_to_index
+
+MC_SIMS = 500
+# adaptive mode: sample in batches until the confidence interval clears the thresholds
+ADAPTIVE_BATCH = 250
+ADAPTIVE_MAX_SIMS = 20000
+CONFIDENCE_Z = 2.58
+# enumerate every runout/opponent hand instead of sampling when there are at most this many
+EXACT_MAX_COMBOS = 60000
+SAMPLERS = ('iid', 'stratified', 'antithetic', 'qmc')
+# independent random shifts of the quasi-random sequence; their spread gives the stderr
+QMC_REPLICAS = 8
+
+# num_groups: independent rows the stderr was measured over (None: one per sim)
+EquityResult = namedtuple('EquityResult', ['equity', 'stderr', 'num_sims', 'num_groups'], defaults=[None])
+
+_RNG = np.random.default_rng()
+
+def seed(value):
+    '''
+    Reseed the module RNG used when no rng is passed, e.g. for common random numbers.
+    '''
+    global _RNG
+    _RNG = np.random.default_rng(value)
+
+# -------------------------------------------------------------------------
+# Monte Carlo equity
+# -------------------------------------------------------------------------
+def draw_runouts(dead, num_cards, num_sims, rng=None):
+    """
+    Draw num_sims independent deals of num_cards cards each, without replacement
+    from the deck minus the dead cards. Returns a (num_sims, num_cards) index array.
+    """
+    rng = _RNG if rng is None else rng
+    live = np.setdiff1d(np.arange(52), dead)
+    keys = rng.random((num_sims, len(live)))
+    # the num_cards smallest keys form a uniform subset; sorting them gives a uniform order
+    picked = np.argpartition(keys, num_cards - 1, axis=1)[:, :num_cards]
+    order = np.argsort(np.take_along_axis(keys, picked, axis=1), axis=1)
+    return live[np.take_along_axis(picked, order, axis=1)]
+
+def showdown_shares(hole, board, opp_holes, runout):
+    """
+    Hero's share of the pot for each deal. opp_holes is (N, num_opponents, 2) and
+    runout is (N, 5 - len(board)). Ties split the pot evenly between the tied hands.
+    """
+    n, num_opponents = opp_holes.shape[:2]
+    full_board = np.concatenate([np.broadcast_to(np.asarray(board, dtype=runout.dtype), (n, len(board))), runout], axis=1)
+    hands = np.empty((n, num_opponents + 1, 7), dtype=runout.dtype)
+    hands[:, 0, :2] = hole
+    hands[:, 1:, :2] = opp_holes
+    hands[:, :, 2:] = full_board[:, None, :]
+    scores = hand_eval.evaluate_batch(hands.reshape(-1, 7)).reshape(n, num_opponents + 1)
+    best = scores.min(axis=1)
+    hero_best = scores[:, 0] == best
+    num_best = (scores == best[:, None]).sum(axis=1)
+    return np.where(hero_best, 1.0 / num_best, 0.0)
+
+def simulate(hole, board, num_opponents=1, num_sims=MC_SIMS, rng=None):
+    """
+    Hero's pot share for num_sims random deals. hole and board are card indices.
+    """
+    num_future = 5 - len(board)
+    deal = draw_runouts(list(hole) + list(board), 2 * num_opponents + num_future, num_sims, rng)
+    opp_holes = deal[:, :2 * num_opponents].reshape(num_sims, num_opponents, 2)
+    return showdown_shares(hole, board, opp_holes, deal[:, 2 * num_opponents:])
+
+def batch_equity(holes, boards, num_sims=MC_SIMS, rng=None):
+    """
+    Heads-up equity for many spots at once. holes is (B, 2) card indices and boards
+    is (B, 5) with -1 for cards not dealt yet. Returns a (B,) array.
+    """
+    rng = _RNG if rng is None else rng
+    holes, boards = np.asarray(holes), np.asarray(boards)
+    b = len(holes)
+    rows = np.arange(b)[:, None]
+    keys = rng.random((b, num_sims, 52), dtype=np.float32)
+    # dead cards get keys above every live card so they are never picked
+    # (undealt board slots re-mark a hole card, which is dead already)
+    dead = np.zeros((b, 52), dtype=bool)
+    dead[rows, holes] = True
+    dead[rows, np.where(boards >= 0, boards, holes[:, :1])] = True
+    keys[np.broadcast_to(dead[:, None, :], keys.shape)] = 2.0
+    picked = np.argpartition(keys, 6, axis=2)[..., :7]
+    order = np.argsort(np.take_along_axis(keys, picked, axis=2), axis=2)
+    deal = np.take_along_axis(picked, order, axis=2)
+    full_board = np.where(boards[:, None, :] >= 0, boards[:, None, :], deal[..., 2:])
+    hero = np.concatenate([np.broadcast_to(holes[:, None, :], (b, num_sims, 2)), full_board], axis=2)
+    opp = np.concatenate([deal[..., :2], full_board], axis=2)
+    hero_rank = hand_eval.evaluate_batch(hero.reshape(-1, 7)).reshape(b, num_sims)
+    opp_rank = hand_eval.evaluate_batch(opp.reshape(-1, 7)).reshape(b, num_sims)
+    return ((hero_rank < opp_rank) + 0.5 * (hero_rank == opp_rank)).mean(axis=1)
+
+# -------------------------------------------------------------------------
+# Variance-reduced samplers
+# -------------------------------------------------------------------------
+def sample_groups(hole, board, num_opponents=1, num_sims=MC_SIMS, rng=None, sampler='iid'):
+    """
+    Hero's pot shares for about num_sims deals as a (num_groups, group_size) array.
+    Rows are independent and each row mean is an unbiased equity estimate, so the
+    spread of the row means measures the sampler's variance whatever the
+    correlation within a row:
+
+      iid         one random deal per row
+      stratified  one deal for every possible next board card (the turn on the
+                  flop, the river on the turn), the rest random; i.i.d. on the river
+      antithetic  a random deal and its partner with hero's main suit swapped
+                  for another suit
+      qmc         QMC_REPLICAS randomly shifted Kronecker sequences decoded into deals
+
+    Rows are always full, so the number of deals can differ from num_sims.
+    """
+    if sampler not in SAMPLERS:
+        raise ValueError(f"sampler must be one of {SAMPLERS}, got {sampler!r}")
+    rng = _RNG if rng is None else rng
+    num_future = 5 - len(board)
+    num_cards = 2 * num_opponents + num_future
+    dead = list(hole) + list(board)
+    if sampler == 'stratified' and num_future > 0:
+        deal, group_size = _stratified_deals(dead, num_cards, num_future, num_sims, rng)
+    elif sampler == 'antithetic':
+        deal = draw_runouts(dead, num_cards, max(num_sims // 2, 2), rng)
+        deal = np.stack([deal, _suit_swapped(deal, dead, rng)], axis=1).reshape(-1, num_cards)
+        group_size = 2
+    elif sampler == 'qmc':
+        group_size = max(num_sims // QMC_REPLICAS, 1)
+        deal = _qmc_deals(dead, num_cards, QMC_REPLICAS, group_size, rng)
+    else:
+        deal, group_size = draw_runouts(dead, num_cards, num_sims, rng), 1
+    n = len(deal)
+    opp_holes = deal[:, :2 * num_opponents].reshape(n, num_opponents, 2)
+    shares = showdown_shares(hole, board, opp_holes, deal[:, 2 * num_opponents:])
+    return shares.reshape(-1, group_size)
+
+def _stratified_deals(dead, num_cards, num_future, num_sims, rng):
+    # row = one sweep over every live card as the first runout card
+    live = np.setdiff1d(np.arange(52), dead)
+    k = len(live)
+    num_groups = max(num_sims // k, 2)
+    strata = np.tile(np.arange(k), num_groups)
+    keys = rng.random((len(strata), k))
+    keys[np.arange(len(strata)), strata] = 2.0  # the stratum card is not dealt again
+    picked = np.argpartition(keys, num_cards - 2, axis=1)[:, :num_cards - 1]
+    order = np.argsort(np.take_along_axis(keys, picked, axis=1), axis=1)
+    rest = live[np.take_along_axis(picked, order, axis=1)]
+    num_opp_cards = num_cards - num_future
+    deal = np.concatenate([rest[:, :num_opp_cards], live[strata, None], rest[:, num_opp_cards:]], axis=1)
+    return deal, k
+
+def _suit_swapped(deal, dead, rng):
+    # swap the suit hero holds most of with a random other suit; a card whose twin
+    # is dead keeps its suit, so the partner is a valid deal with the same distribution
+    main = int(np.bincount(np.asarray(dead) & 3, minlength=4).argmax())
+    other = (main + rng.integers(1, 4, (len(deal), 1))) % 4
+    suit = deal & 3
+    swapped = (deal & ~3) | np.where(suit == main, other, np.where(suit == other, main, suit))
+    is_dead = np.zeros(52, dtype=bool)
+    is_dead[dead] = True
+    return np.where(is_dead[swapped], deal, swapped)
+
+def _kronecker_alpha(dim):
+    # R_d sequence: powers of the inverse generalized golden ratio
+    g = 2.0
+    for _ in range(50):
+        g = (1 + g) ** (1 / (dim + 1))
+    return (1 / g) ** np.arange(1, dim + 1) % 1
+
+def _qmc_deals(dead, num_cards, num_replicas, num_points, rng):
+    live = np.setdiff1d(np.arange(52), dead)
+    k = len(live)
+    shifts = rng.random((num_replicas, 1, num_cards))
+    u = (shifts + np.arange(num_points)[None, :, None] * _kronecker_alpha(num_cards)) % 1
+    u = u.reshape(-1, num_cards)
+    # partial Fisher-Yates shuffle driven by the quasi-random coordinates
+    deck = np.broadcast_to(live, (len(u), k)).copy()
+    rows = np.arange(len(u))
+    for j in range(num_cards):
+        pick = j + np.minimum((u[:, j] * (k - j)).astype(np.int64), k - j - 1)
+        deck[rows, j], deck[rows, pick] = deck[rows, pick], deck[rows, j]
+    return deck[:, :num_cards]
+
+def sample_stats(hole, board, num_opponents=1, num_sims=MC_SIMS, rng=None, sampler='iid'):
+    """
+    (sum of row means, sum of squared row means, number of rows, number of deals)
+    for sample_groups, the sufficient statistics that serial and pooled sampling
+    both merge into.
+    """
+    means = sample_groups(hole, board, num_opponents, num_sims, rng, sampler)
+    num_deals = means.size
+    means = means.mean(axis=1)
+    return float(means.sum()), float(np.dot(means, means)), len(means), num_deals
+
+def measure_variance(hole, board, num_opponents=1, num_sims=MC_SIMS, num_runs=200, rng=None, sampler='iid'):
+    """
+    Per-deal variance of a sampler: the spread of num_runs independent num_sims
+    estimates, times the deals per estimate. Plain MC needs variance / target_se**2
+    deals for a given precision, so comparing this figure across samplers gives
+    their sample efficiency. hole and board are card indices.
+    """
+    estimates = np.zeros(num_runs)
+    num_deals = 0
+    for i in range(num_runs):
+        total, _, num_groups, num_deals = sample_stats(hole, board, num_opponents, num_sims, rng, sampler)
+        estimates[i] = total / num_groups
+    return float(estimates.var(ddof=1) * num_deals)
+
+def num_combos(num_board, num_opponents=1):
+    """
+    Number of distinct (runout, opponent hands) deals left with num_board cards out.
+    """
+    live = 50 - num_board
+    n = comb(live, 5 - num_board)
+    live -= 5 - num_board
+    for _ in range(num_opponents):
+        n *= comb(live, 2)
+        live -= 2
+    return n // factorial(num_opponents)
+
+EQUITY_MODES = ('auto', 'exact', 'mc')
+
+def use_exact(num_board, num_opponents):
+    # exact enumeration is implemented heads-up, where the turn and river are small
+    return num_opponents == 1 and num_combos(num_board) <= EXACT_MAX_COMBOS
+
+def exact_equity(hole, board):
+    """
+    Heads-up equity of treys hole cards against one random hand, enumerating every
+    remaining runout and opponent holding. Zero variance; num_sims is the number of
+    deals enumerated.
+    """
+    hole, board = treys_to_index(hole), treys_to_index(board)
+    live = np.setdiff1d(np.arange(52), hole + board).astype(np.int16)
+    num_future = 5 - len(board)
+    runouts = list(itertools.combinations(live.tolist(), num_future))
+    runouts = np.array(runouts, dtype=np.int16).reshape(len(runouts), num_future)
+    i, j = np.triu_indices(len(live), 1)
+    pairs = np.stack([live[i], live[j]], axis=1)
+    # every opponent hand that does not use a runout card, for every runout
+    overlap = (pairs[None, :, :, None] == runouts[:, None, None, :]).any(axis=(2, 3))
+    r_idx, k_idx = np.nonzero(~overlap)
+    full_board = np.concatenate([np.broadcast_to(np.array(board, dtype=np.int16), (len(runouts), len(board))), runouts], axis=1)
+    hero = hand_eval.evaluate_batch(np.concatenate([np.broadcast_to(np.array(hole, dtype=np.int16), (len(runouts), 2)), full_board], axis=1))[r_idx]
+    opp = hand_eval.evaluate_batch(np.concatenate([pairs[k_idx], full_board[r_idx]], axis=1))
+    shares = (hero < opp) + 0.5 * (hero == opp)
+    return EquityResult(float(shares.mean()), 0.0, len(shares))
+
+def estimate_equity(hole, board, num_opponents=1, num_sims=MC_SIMS, rng=None, pool=None, mode='auto',
+                    sampler='iid'):
+    """
+    Equity of treys hole cards against num_opponents random hands.
+    Returns an EquityResult with the equity, its standard error and the number of sims.
+    mode 'auto' enumerates exactly when the remaining deal space is small (see
+    use_exact) and samples otherwise; 'exact' and 'mc' force one or the other.
+    Exact enumeration is heads-up only, so 'exact' raises ValueError with more
+    than one opponent.
+    With an equity_pool.EquityPool the sims are split across its worker processes.
+    sampler picks how deals are sampled (see sample_groups).
+    """
+    if mode not in EQUITY_MODES:
+        raise ValueError(f"unknown equity mode {mode!r}, expected one of {EQUITY_MODES}")
+    if mode == 'exact' and num_opponents != 1:
+        raise ValueError(f"exact equity is heads-up only, got num_opponents={num_opponents}")
+    if mode == 'exact' or (mode == 'auto' and use_exact(len(board), num_opponents)):
+        return exact_equity(hole, board)
+    hole, board = treys_to_index(hole), treys_to_index(board)
+    if pool is not None:
+        return _result(*pool.sample_stats(hole, board, num_opponents, num_sims, sampler))
+    return _result(*sample_stats(hole, board, num_opponents, num_sims, rng, sampler))
+
+def _result(total, total_sq, n, num_sims):
+    # n independent row means over num_sims deals in total
+    mean = total / n
+    var = max(total_sq - n * mean * mean, 0.0) / (n - 1) if n > 1 else 0.0
+    return EquityResult(float(mean), float(np.sqrt(var / n)), num_sims, n)
+
+def t_quantile(z, df):
+    '''
+    The Student-t quantile with df degrees of freedom at the normal quantile z's
+    probability: exact for df 1 and 2, a Cornish-Fisher expansion (within 0.01 for
+    z up to 3) beyond.
+    '''
+    if df < 1:
+        return inf
+    p = 0.5 * (1 + erf(z / sqrt(2)))
+    if df == 1:
+        return tan(pi * (p - 0.5))
+    if df == 2:
+        return (2 * p - 1) / sqrt(2 * p * (1 - p))
+    v = df
+    return (z + (z**3 + z) / (4 * v) + (5 * z**5 + 16 * z**3 + 3 * z) / (96 * v**2)
+            + (3 * z**7 + 19 * z**5 + 17 * z**3 - 15 * z) / (384 * v**3)
+            + (79 * z**9 + 776 * z**7 + 1482 * z**5 - 1920 * z**3 - 945 * z) / (92160 * v**4))
+
+def clears(res, thresholds, z=CONFIDENCE_Z):
+    '''
+    True when the z-sigma interval around res.equity lies entirely on one side of
+    every threshold, i.e. more samples would not change the decision. The stderr
+    of few groups (e.g. the QMC replicas) is itself noisy, so z is widened to the
+    t quantile for num_groups - 1 degrees of freedom.
+    '''
+    num_groups = res.num_sims if res.num_groups is None else res.num_groups
+    z = t_quantile(z, num_groups - 1)
+    return all(abs(res.equity - t) > z * res.stderr for t in thresholds)
+
+def adaptive_equity(hole, board, thresholds, num_opponents=1, batch_size=ADAPTIVE_BATCH,
+                    max_sims=ADAPTIVE_MAX_SIMS, z=CONFIDENCE_Z, prior=None, rng=None, pool=None,
+                    sampler='iid'):
+    """
+    Sequential Monte Carlo equity: draws batch_size sims at a time and stops as soon
+    as the estimate clears every decision threshold (see clears) or max_sims is
+    reached. prior is an earlier EquityResult for the same spot to continue from.
+    The returned num_sims is the number of samples the estimate is based on.
+    With a pool, each batch is batch_size sims per worker process. Spots small
+    enough to enumerate (see use_exact) return the exact equity instead. Every
+    batch is drawn with sampler (see sample_groups).
+    """
+    if use_exact(len(board), num_opponents):
+        return exact_equity(hole, board)
+    hole, board = treys_to_index(hole), treys_to_index(board)
+    if pool is not None:
+        batch_size *= pool.processes
+    total = total_sq = 0.0
+    n = num_deals = 0
+    if prior is not None and prior.num_sims > 1:
+        # rebuild the row statistics the prior was computed from
+        n = prior.num_sims if prior.num_groups is None else prior.num_groups
+        num_deals = prior.num_sims
+        total = prior.equity * n
+        total_sq = prior.stderr ** 2 * n * (n - 1) + n * prior.equity ** 2
+    while num_deals < max_sims:
+        num_sims = min(batch_size, max_sims - num_deals)
+        if pool is not None:
+            stats = pool.sample_stats(hole, board, num_opponents, num_sims, sampler)
+        else:
+            stats = sample_stats(hole, board, num_opponents, num_sims, rng, sampler)
+        total += stats[0]
+        total_sq += stats[1]
+        n += stats[2]
+        num_deals += stats[3]
+        res = _result(total, total_sq, n, num_deals)
+        if clears(res, thresholds, z):
+            return res
+    return _result(total, total_sq, n, num_deals)
+
+def _treys_equity(hole, board, num_opponents, num_sims):
+    # the original one-sim-at-a-time loop, kept as the benchmark reference
+    from treys import Deck, Evaluator
+    evaluator = Evaluator()
+    wins = ties = 0
+    for _ in range(num_sims):
+        deck = Deck()
+        for c in hole + board:
+            deck.cards.remove(c)
+        opps = [deck.draw(2) for _ in range(num_opponents)]
+        full_board = board + deck.draw(5 - len(board))
+        my_score = evaluator.evaluate(hole, full_board)
+        best_opp = min(evaluator.evaluate(h, full_board) for h in opps)
+        if my_score < best_opp:
+            wins += 1
+        elif my_score == best_opp:
+            ties += 1
+    return (wins + ties / 2) / num_sims
+
+if __name__ == '__main__':
+    hole = [Card.new('As'), Card.new('Kd')]
+    board = [Card.new('2c'), Card.new('7h'), Card.new('Td')]
+    estimate_equity(hole, board, num_sims=1000)  # warm up
+    for num_opponents in (1, 5):
+        start = time.perf_counter()
+        _treys_equity(hole, board, num_opponents, MC_SIMS)
+        old_rate = MC_SIMS / (time.perf_counter() - start)
+        start = time.perf_counter()
+        res = estimate_equity(hole, board, num_opponents, num_sims=10000)
+        rate = res.num_sims / (time.perf_counter() - start)
+        print(f"{num_opponents} opp: equity = {res.equity:.4f} +/- {res.stderr:.4f}, "
+              f"{rate:,.0f} sims/s vs {old_rate:,.0f} sims/s in the treys loop ({rate / old_rate:.0f}x)")
+    for cards in ([Card.new('Jc')], [Card.new('Jc'), Card.new('3s')]):
+        start = time.perf_counter()
+        res = exact_equity(hole, board + cards)
+        exact_ms = (time.perf_counter() - start) * 1000
+        sampled = estimate_equity(hole, board + cards, num_sims=MC_SIMS, mode='mc')
+        print(f"{len(board + cards)} board cards: exact equity = {res.equity:.4f} over {res.num_sims} deals in {exact_ms:.1f} ms, "
+              f"{MC_SIMS} samples give {sampled.equity:.4f} +/- {sampled.stderr:.4f}")
+    for threshold in (0.20, 0.40, 0.50, 0.54):
+        res = adaptive_equity(hole, board, [threshold])
+        print(f"threshold {threshold:.2f}: equity = {res.equity:.4f} +/- {res.stderr:.4f} after {res.num_sims} sims")
+    print(f"samplers ({2 * MC_SIMS} sims per estimate; effective = deals/s scaled by iid variance / sampler variance):")
+    draw_hole, draw_board = [Card.new('9h'), Card.new('8h')], [Card.new('7h'), Card.new('6c'), Card.new('2d')]
+    for spot_hole, spot_board, num_opponents in ((hole, board, 1), (hole, board, 5), (draw_hole, draw_board, 1),
+                                                 (draw_hole, draw_board + [Card.new('Ks')], 3)):
+        h, b = treys_to_index(spot_hole), treys_to_index(spot_board)
+        iid_var = None
+        for sampler in SAMPLERS:
+            start = time.perf_counter()
+            var = measure_variance(h, b, num_opponents, 2 * MC_SIMS, 300, sampler=sampler)
+            rate = 300 * 2 * MC_SIMS / (time.perf_counter() - start)
+            iid_var = var if iid_var is None else iid_var
+            spot = ' '.join(ALL_CARDS[c] for c in h) + ' | ' + ' '.join(ALL_CARDS[c] for c in b)
+            print(f"  {spot} vs {num_opponents}: {sampler:10s} "
+                  f"variance/deal {var:.4f}, {rate:,.0f} deals/s, {rate * iid_var / var:,.0f} effective samples/s")
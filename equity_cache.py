@@ -0,0 +1,135 @@
+"""
+Suit-isomorphic LRU cache in front of the equity engine.
+
+Spots that differ only by a relabelling of suits (e.g. the same hole cards on a
+suit-rotated flop) have the same equity, so they share one cache entry.
+"""
+import atexit
+import itertools
+import os
+import pickle
+from collections import OrderedDict
+
+import equity
+
+MAX_ENTRIES = 200000
+# set to persist the shared cache between runs
+CACHE_PATH = os.environ.get('EQUITY_CACHE_PATH')
+
+# _SUIT_MAPS[p][card] = card with its suit relabelled by the p-th suit permutation
+_SUIT_MAPS = [[(c & ~3) | perm[c & 3] for c in range(52)]
+              for perm in itertools.permutations(range(4))]
+
+def canonical_key(hole, board, num_opponents):
+    """
+    Key shared by every suit relabelling of (hole, board). Card order within the
+    hole and the board does not matter. hole and board are card indices.
+    """
+    best = None
+    for suit_map in _SUIT_MAPS:
+        key = (tuple(sorted(suit_map[c] for c in hole)), tuple(sorted(suit_map[c] for c in board)))
+        if best is None or key < best:
+            best = key
+    return (num_opponents,) + best
+
+class EquityCache:
+    '''
+    Bounded LRU map from canonical keys to EquityResults, with hit/miss/eviction
+    counters and optional persistence to a pickle file.
+    '''
+
+    def __init__(self, max_entries=MAX_ENTRIES, path=None):
+        self.max_entries = max_entries
+        self.path = path
+        self.entries = OrderedDict()
+        self.hits = self.misses = self.evictions = 0
+        if path is not None:
+            self.load()
+            atexit.register(self.save)
+
+    def get(self, key, accept=None):
+        '''
+        Cached result for key, or None if it is absent or rejected by accept(result).
+        '''
+        res = self.entries.get(key)
+        if res is None or (accept is not None and not accept(res)):
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return res
+
+    def peek(self, key):
+        '''
+        Cached result for key without touching the LRU order or the counters.
+        '''
+        return self.entries.get(key)
+
+    def put(self, key, res):
+        self.entries[key] = res
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        '''
+        Drop every entry and reset the counters.
+        '''
+        self.entries.clear()
+        self.hits = self.misses = self.evictions = 0
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'entries':   len(self.entries),
+            'hits':      self.hits,
+            'misses':    self.misses,
+            'evictions': self.evictions,
+            'hit_rate':  self.hits / lookups if lookups else 0.0,
+        }
+
+    def load(self):
+        if self.path is None or not os.path.exists(self.path):
+            return
+        with open(self.path, 'rb') as f:
+            for key, res in pickle.load(f):
+                self.put(key, res)
+        self.evictions = 0
+
+    def save(self):
+        if self.path is None:
+            return
+        tmp = self.path + '.tmp'
+        with open(tmp, 'wb') as f:
+            pickle.dump(list(self.entries.items()), f)
+        os.replace(tmp, self.path)
+
+SHARED_CACHE = EquityCache(path=CACHE_PATH)
+
+def cached_equity(hole, board, num_opponents=1, num_sims=equity.MC_SIMS, thresholds=None, pool=None,
+                  cache=SHARED_CACHE, sampler='iid'):
+    """
+    equity.estimate_equity behind a suit-isomorphic cache. A cached result is reused
+    when it was estimated with at least num_sims samples.
+
+    With thresholds, the estimate is sampled adaptively (equity.adaptive_equity) and
+    a cached result is reused when it already clears them; otherwise sampling
+    continues from the cached samples and the longer estimate replaces them.
+    Misses are sampled on pool (an equity_pool.EquityPool) when one is given, with
+    sampler (see equity.sample_groups).
+    """
+    # samplers differ in how their stderr is measured, so each keeps its own entries
+    key = (sampler,) + canonical_key(equity.treys_to_index(hole), equity.treys_to_index(board), num_opponents)
+    if thresholds is None:
+        res = cache.get(key, lambda r: r.num_sims >= num_sims)
+        if res is None:
+            res = equity.estimate_equity(hole, board, num_opponents, num_sims, pool=pool, sampler=sampler)
+            cache.put(key, res)
+        return res
+    res = cache.get(key, lambda r: r.num_sims >= equity.ADAPTIVE_MAX_SIMS or equity.clears(r, thresholds))
+    if res is None:
+        res = equity.adaptive_equity(hole, board, thresholds, num_opponents, prior=cache.peek(key), pool=pool,
+                                     sampler=sampler)
+        cache.put(key, res)
+    return res
@@ -0,0 +1,80 @@
+"""
+Persistent process pool for equity sims.
+
+The pool is created once and reused for every decision. Each call splits its sim
+budget across the workers, gives every chunk its own RNG stream spawned from one
+SeedSequence, and merges the per-chunk share sums back into a single estimate.
+"""
+import atexit
+import multiprocessing as mp
+import os
+import sys
+import time
+
+import numpy as np
+from treys import Card
+
+import equity
+
+EQUITY_MODES = ('serial', 'parallel')
+
+def _sample_chunk(hole, board, num_opponents, num_sims, seed, sampler):
+    return equity.sample_stats(hole, board, num_opponents, num_sims, np.random.default_rng(seed), sampler)
+
+class EquityPool:
+    '''
+    A fixed set of worker processes that run equity.sample_stats on independent
+    RNG streams.
+    '''
+
+    def __init__(self, processes=None, seed=None):
+        self.processes = processes or os.cpu_count() or 1
+        self.seed_seq = np.random.SeedSequence(seed)
+        self.pool = mp.Pool(self.processes)
+
+    def sample_stats(self, hole, board, num_opponents, num_sims, sampler='iid'):
+        '''
+        Same contract as equity.sample_stats, with the sims split across the workers.
+        '''
+        chunk, extra = divmod(num_sims, self.processes)
+        sizes = [chunk + (i < extra) for i in range(self.processes)]
+        sizes = [n for n in sizes if n > 0]
+        seeds = self.seed_seq.spawn(len(sizes))
+        tasks = [(hole, board, num_opponents, n, s, sampler) for n, s in zip(sizes, seeds)]
+        stats = [0.0, 0.0, 0, 0]
+        for part in self.pool.starmap(_sample_chunk, tasks):
+            stats = [a + b for a, b in zip(stats, part)]
+        return tuple(stats)
+
+    def close(self):
+        self.pool.close()
+        self.pool.join()
+
+_SHARED_POOL = None
+
+def shared_pool():
+    '''
+    The process-wide pool, started on first use and shut down at exit.
+    '''
+    global _SHARED_POOL
+    if _SHARED_POOL is None:
+        _SHARED_POOL = EquityPool()
+        atexit.register(_SHARED_POOL.close)
+    return _SHARED_POOL
+
+def pool_for_mode(mode):
+    if mode not in EQUITY_MODES:
+        raise ValueError(f"equity mode must be one of {EQUITY_MODES}, got {mode!r}")
+    return shared_pool() if mode == 'parallel' else None
+
+if __name__ == '__main__':
+    num_sims = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    hole = [Card.new('As'), Card.new('Kd')]
+    board = [Card.new('2c'), Card.new('7h'), Card.new('Td')]
+    pool = shared_pool()
+    equity.estimate_equity(hole, board, 5, 1000, pool=pool)  # warm up the workers
+    for label, kwargs in (('serial', {}), (f'{pool.processes} workers', {'pool': pool})):
+        start = time.perf_counter()
+        res = equity.estimate_equity(hole, board, 5, num_sims, **kwargs)
+        elapsed = time.perf_counter() - start
+        print(f"{label}: 5 opp equity = {res.equity:.4f} +/- {res.stderr:.4f}, {num_sims} sims in {elapsed * 1000:.1f} ms")
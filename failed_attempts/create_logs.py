@@ -1,145 +1,239 @@
 import os
-import json
-import pickle
 import random
+import sys
+import time
+import multiprocessing as mp
 
-from openCFR.games.sample_games import TexasHoldEm
-from openCFR.minimizers import CFRPlus
-from openCFR.minimizers import VanillaCFR
-from openCFR.Trainer import Trainer
+import numpy as np
+from treys import Card, Evaluator
 
 from pypokerengine.api.game import setup_config, start_poker
 from pypokerengine.players import BasePokerPlayer
 
 from openCFR.games.sample_games import TexasHoldEm
-from importlib import resources
+from strategy_store import open_pretrained
+from selfplay_log import ChunkWriter, STREETS, card_indices, read_records
 
 GAME = TexasHoldEm(small_blind=2, big_blind=4, starting_stack=50)
-with resources.files('openCFR').joinpath('pretrained/TexasHoldEm_final.pickle').open('rb') as f:
-    INFOSETS = pickle.load(f) 
+# memory-mapped average strategies; the first run converts openCFR's pickle
+INFOSETS = open_pretrained()
 print(f"Loaded {len(INFOSETS):,}")
 
+EVALUATOR = Evaluator()
+ROUND_STREETS = ['preflop', 'flop', 'turn', 'river']
+FOLD, CALL, RAISE = 0, 1, 2        # logged action / teacher probability columns
+# openCFR action token -> FOLD / CALL / RAISE (Check, Bet_3BB, Bet_6BB, Bet_9BB, Call, Fold)
+TOKEN_ACTION = np.array([CALL, RAISE, RAISE, RAISE, CALL, FOLD])
+
 # -------------------------------------------------------------------------
-# 2) History builder: map PyPokerEngine state → openCFR infoset key
-# --------------------------    -----------------------------------------------
-def build_history_from_round_state(game, hole_cards, round_state):
-    history = []
-    street = round_state['street']
-
-    # 2a) Hero's private chance events: bucket the hole cards
-    for card in hole_cards:
-        bucket = game.bucket_hole_cards(0, card)
-        history.append(('r', str(bucket)))
-
-    # 2b) Community chance events when they appear
-    if street == 'flop':
-        cards = round_state['community_card'][0:3]
-    elif street == 'turn':
-        cards = [round_state['community_card'][3]]
-    elif street == 'river':
-        cards = [round_state['community_card'][4]]
-    else:
-        cards = []
-    for c in cards:
-        b = game.bucket_public_card(c)
-        history.append(('r', str(b)))
-
-    # 2c) Player actions this street
-    actions = round_state['action_histories'][street]
-    for act in actions:
-        # map UUID to seat index (0 or 1)
-        pid = 0 if act['uuid'] == round_state['seats'][0]['uuid'] else 1
-        name = act['action'].lower()
-        if name not in game.action_map:
-            name = 'raise'
-        aidx = game.action_map.index(name)
-        history.append((pid, aidx))
-
-    return history
+# 1) Abstraction: openCFR's hand buckets and bet sizes
+# -------------------------------------------------------------------------
+def bucket_hole_cards(hole_cards):
+    '''
+    Preflop bucket of PyPokerEngine hole cards ('HA'): Pair, Suited_Or_Connector or Other.
+    '''
+    (s1, r1), (s2, r2) = hole_cards
+    if r1 == r2:
+        return 'Pair'
+    if s1 == s2 or abs(Card.CHAR_RANK_TO_INT_RANK[r1] - Card.CHAR_RANK_TO_INT_RANK[r2]) == 1:
+        return 'Suited_Or_Connector'
+    return 'Other'
+
+def bucket_hand(hole_cards, community_cards):
+    '''
+    Postflop bucket by made hand: Strong (straight or better), Average (two pair, trips), Weak (pair) or Very_Weak.
+    '''
+    rank_class = EVALUATOR.get_rank_class(EVALUATOR.evaluate(to_treys(community_cards), to_treys(hole_cards)))
+    if rank_class <= 5:
+        return 'Strong'
+    if rank_class <= 7:
+        return 'Average'
+    return 'Weak' if rank_class == 8 else 'Very_Weak'
+
+def to_treys(cards):
+    return [Card.new(c[1] + c[0].lower()) for c in cards]
+
+def street_bucket(hole_cards, community_cards, street):
+    return bucket_hole_cards(hole_cards) if street == 'preflop' else bucket_hand(hole_cards, community_cards)
+
+def bet_token(raise_size, big_blind):
+    '''
+    openCFR bet token (1 Bet_3BB, 2 Bet_6BB, 3 Bet_9BB) nearest a raise of raise_size chips.
+    '''
+    return int(np.clip(round(raise_size / (3 * big_blind)), 1, 3))
+
+# -------------------------------------------------------------------------
+# 2) Infoset key tracker: follow PyPokerEngine's messages → openCFR infoset key
+# -------------------------------------------------------------------------
+class InfosetKeyTracker:
+    '''
+    Builds the hero's openCFR infoset key (GAME.get_infoset_key's format: own bucket at the start of each street and
+    every action token, '-'-joined) as the hand's events arrive, so a lookup reads one string instead of rebuilding
+    the history. Also counts the lookups whose key the pretrained strategy does not contain.
+    '''
+
+    def __init__(self):
+        self.key = ''
+        self.hole_cards = []
+        self.lookups = 0
+        self.misses = 0
+
+    def _push(self, token):
+        self.key = f'{self.key}-{token}' if self.key else str(token)
+
+    def start_round(self, hole_cards):
+        self.key = ''
+        self.hole_cards = hole_cards
+
+    def start_street(self, street, round_state):
+        if street not in ROUND_STREETS:
+            return
+        self._push(street_bucket(self.hole_cards, round_state['community_card'], street))
+        self.big_blind = 2 * round_state['small_blind_amount']
+        # chips each player has in on this street; preflop starts with the blinds
+        self.street_bets = {}
+        for act in round_state['action_histories'].get(street, []):
+            self.street_bets[act['uuid']] = act['amount']
+        self.street_max = max(self.street_bets.values(), default=0)
+
+    def update(self, action):
+        uuid, name, amount = action['player_uuid'], action['action'], action['amount']
+        if name == 'fold':
+            self._push(5)
+            return
+        paid = amount - self.street_bets.get(uuid, 0)
+        if name == 'call':
+            self._push(0 if paid == 0 else 4)
+        else:
+            self._push(bet_token(amount - self.street_max, self.big_blind))
+        self.street_bets[uuid] = amount
+        self.street_max = max(self.street_max, amount)
+
+    def lookup(self):
+        '''
+        (key, average strategy or None) for the current state.
+        '''
+        strat = INFOSETS.get_average_strategy(self.key)
+        self.lookups += 1
+        self.misses += strat is None
+        return self.key, strat
 
 # -------------------------------------------------------------------------
 # 3) LoggerPlayer: logs state + CFR policy at each hero decision
 # -------------------------------------------------------------------------
 class CFRLogger(BasePokerPlayer):
+    '''
+    Plays the pretrained CFR strategy and appends every decision it makes to a selfplay_log.ChunkWriter.
+    '''
+
     def __init__(self, logger, seat_id):
         self.logger = logger
         self.seat_id = seat_id
         self.hole_cards = []
+        self.tracker = InfosetKeyTracker()
 
     def receive_round_start_message(self, round_count, hole_card, seats):
         # store hero hole cards
         self.hole_cards = hole_card
+        self.tracker.start_round(hole_card)
+
+    def receive_street_start_message(self, street, round_state):
+        self.tracker.start_street(street, round_state)
+
+    def receive_game_update_message(self, action, round_state):
+        self.tracker.update(action)
+
+    def teacher(self, can_raise):
+        '''
+        (fold/call/raise probabilities, openCFR tokens, their probabilities) at the tracked infoset; uniform over the
+        legal actions when the pretrained strategy does not contain it.
+        '''
+        key, strat = self.tracker.lookup()
+        if strat is None:
+            tokens = np.array([5, 4, 1] if can_raise else [5, 4])
+            strat = np.full(len(tokens), 1 / len(tokens))
+        else:
+            tokens = INFOSETS.available_actions(key)
+            if not can_raise:
+                strat = np.where(TOKEN_ACTION[tokens] == RAISE, 0, strat)
+                strat = strat / strat.sum() if strat.sum() > 0 else np.where(tokens == 5, 1.0, 0)
+        probs = np.bincount(TOKEN_ACTION[tokens], weights=strat, minlength=3)
+        return probs, tokens, strat
 
     def declare_action(self, valid_actions, hole_cards, round_state):
-        # build imperfect‐info history
-        history = build_history_from_round_state(GAME,
-                                                 self.hole_cards,
-                                                 round_state)
-        key = GAME.get_infoset_key(history)
-        info = INFOSETS.get(key)
-        # if key missing, fall back to uniform random
-        if info is None:
-            teacher = {a: 1/len(valid_actions) for a in valid_actions}
-        else:
-            strat = info.get_average_strategy()
-            teacher = {a: strat[i]
-                       for i,a in enumerate(GAME.action_map)
-                       if a in valid_actions}
-            # normalize
-            s = sum(teacher.values())
-            teacher = {a: p/s for a,p in teacher.items()}
-
-        # log the state and teacher policy
-        public = {
-            'community_cards': round_state['community_card'],
-            'pot':              round_state['pot']['main']['amount'],
-            'street':           round_state['street'],
-            'sb_pos':           round_state['small_blind_pos'],
-            'bb_pos':           round_state['big_blind_pos'],
-            'stacks':           [s['stack'] for s in round_state['seats']]
-        }
-        private = {
-            'hole_cards': self.hole_cards,
-            'stack':      round_state['seats'][self.seat_id]['stack']
-        }
-        record = {
-            'public_state':  public,
-            'private_state': private,
-            'action_probs':  teacher
-        }
-        self.logger.write(json.dumps(record) + "\n")
-        self.logger.flush()
-
-        # sample an action just to continue the game
-        choice = random.choices(list(teacher.keys()),
-                                 weights=list(teacher.values()))[0]
-        return choice, 0
+        call_amount = valid_actions[1]['amount']
+        raise_range = valid_actions[2]['amount']
+        probs, tokens, strat = self.teacher(raise_range['max'] != -1)
+
+        # sample an action to continue the game
+        token = int(random.choices(tokens, weights=strat)[0])
+        action = TOKEN_ACTION[token]
+
+        pot = round_state['pot']['main']['amount'] + sum(p['amount'] for p in round_state['pot']['side'])
+        self.logger.append(card_indices(self.hole_cards, round_state['community_card']),
+                           STREETS[round_state['street']], self.seat_id, action, pot,
+                           [s['stack'] for s in round_state['seats']], probs)
+
+        if action == FOLD:
+            return 'fold', 0
+        if action == CALL:
+            return 'call', call_amount
+        size = call_amount + token * 3 * 2 * round_state['small_blind_amount']
+        return 'raise', int(np.clip(size, raise_range['min'], raise_range['max']))
 
     # no-op handlers
     def receive_game_start_message(self, game_info): pass
-    def receive_street_start_message(self, street, round_state): pass
-    def receive_game_update_message(self, action, round_state): pass
     def receive_round_result_message(self, winners, hand_info, round_state): pass
 
 # -------------------------------------------------------------------------
-# 4) Main: self-play with CFRLogger and write JSONL
+# 4) Self-play workers writing chunked binary logs
 # -------------------------------------------------------------------------
-def main(log_path, num_hands=100000):
-    with open(log_path, 'w') as logger:
+def play_games(args):
+    '''
+    Worker: play num_games games into out_dir/selfplay-<worker>.bin, resuming after the games already logged there.
+    Returns (games, records) in the file and (lookups, misses) of this run's infoset keys.
+    '''
+    worker, num_games, seed, out_dir, chunk_records = args
+    with ChunkWriter(os.path.join(out_dir, f'selfplay-{worker:03d}.bin'), chunk_records) as log:
+        # a resumed worker continues with a fresh stream rather than replaying its first games
+        random.seed(hash((seed, worker, log.games)))
         config = setup_config(max_round=4,
                               initial_stack=1000,
                               small_blind_amount=5)
+        players = [CFRLogger(log, 0), CFRLogger(log, 1)]
         config.register_player(name="p0",
-                               algorithm=CFRLogger(logger, 0))
+                               algorithm=players[0])
         config.register_player(name="p1",
-                               algorithm=CFRLogger(logger, 1))
-
-        hands = 0
-        while hands < num_hands:
+                               algorithm=players[1])
+        while log.games < num_games:
             start_poker(config, verbose=0)
-            hands += 1
-            if hands % 5000 == 0:
-                print(f"Logged {hands} hands")
+            log.end_game()
+    return (log.games, log.records, sum(p.tracker.lookups for p in players),
+            sum(p.tracker.misses for p in players))
+
+def main(out_dir, num_games=100000, processes=None, seed=0, chunk_records=4096):
+    '''
+    Play num_games self-play games split over worker processes, each writing its own log file in out_dir.
+    Rerunning with the same arguments after a crash completes the missing games.
+    '''
+    processes = processes or os.cpu_count() or 1
+    os.makedirs(out_dir, exist_ok=True)
+    tasks = [(w, num_games // processes + (w < num_games % processes), seed, out_dir, chunk_records)
+             for w in range(processes)]
+    start = time.perf_counter()
+    if processes > 1:
+        with mp.get_context('fork').Pool(processes) as pool:
+            results = pool.map(play_games, tasks)
+    else:
+        results = [play_games(t) for t in tasks]
+    games, records, lookups, misses = map(sum, zip(*results))
+    print(f"Logged {games:,} games, {records:,} decisions in {time.perf_counter() - start:.1f}s")
+    if lookups:
+        print(f"{misses:,} of {lookups:,} infoset keys ({misses / lookups:.1%}) missing from INFOSETS, played uniformly")
 
 if __name__ == '__main__':
-    main("cfr_selfplay.jsonl", num_hands=100000)
+    out_dir = sys.argv[1] if len(sys.argv) > 1 else 'cfr_selfplay'
+    num_games = int(sys.argv[2]) if len(sys.argv) > 2 else 100000
+    main(out_dir, num_games)
+    records = read_records(out_dir)
+    print(f"read back {len(records):,} records, {records.nbytes:,} bytes")
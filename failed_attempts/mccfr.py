@@ -0,0 +1,310 @@
+"""
+Parallel external-sampling Monte Carlo CFR for openCFR games.
+
+The game tree is built once and every decision node is given a row of a
+RegretTable. Training runs in rounds. Each worker process receives the
+current strategy through shared memory and runs its share of the round's
+traversals. In each traversal, chance outcomes and the opponent's actions
+are sampled and every action of the traverser is explored. Workers return
+their summed regret and strategy updates, which the parent scatter-adds into
+the table before regret matching produces the next round's strategy. Every
+traversal of a round therefore sees the same strategy; with one process and
+one traversal per round this is plain external sampling. Checkpoints are
+compact .npz files that resume a run exactly. The trainer reports
+iterations/s and, for games small enough to solve a best response (Kuhn),
+exploitability over time.
+
+    python mccfr.py [iterations] [processes] [checkpoint_dir]
+"""
+import multiprocessing as mp
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+from RegretTable import RegretTable
+
+_ROOT = None       # game tree, inherited by forked workers
+_STRATEGY = None   # (infosets, max_actions) view of the shared strategy
+
+def index_tree(game, root, table):
+    '''
+    Give every decision node of the tree an infoset_id in table (adding unseen infosets) and every chance node the
+    cumulative distribution of its outcomes. Returns the number of nodes.
+    '''
+    count = 0
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        count += 1
+        if node.is_terminal_node:
+            continue
+        if node.is_chance_node:
+            node.chance_cdf = np.cumsum(node.chance_probs).tolist()
+        else:
+            node.infoset_id = table.get_or_add(game.get_infoset_key(node.history), node.available_actions)
+        stack.extend(node.next_nodes)
+    return count
+
+def _sample(cdf, u):
+    for i, c in enumerate(cdf):
+        if u < c:
+            return i
+    return len(cdf) - 1
+
+def traverse(node, traverser, strategy, rng, regrets, strategy_sums):
+    '''
+    One external-sampling traversal below node. Returns the sampled utility for traverser and adds the traverser's
+    instantaneous regrets and the opponent's current strategies into the regrets / strategy_sums dicts by infoset id.
+    '''
+    if node.is_terminal_node:
+        utility = node.terminal_utility.get_utility()   # for the player to act at the terminal history
+        return utility if node.player == traverser else -utility
+
+    if node.is_chance_node:
+        child = node.next_nodes[_sample(node.chance_cdf, rng.random())]
+        return traverse(child, traverser, strategy, rng, regrets, strategy_sums)
+
+    i = node.infoset_id
+    n = len(node.next_nodes)
+    sigma = strategy[i, :n]
+
+    if node.player == traverser:
+        utils = np.array([traverse(child, traverser, strategy, rng, regrets, strategy_sums)
+                          for child in node.next_nodes])
+        value = float(utils @ sigma)
+        if i in regrets:
+            regrets[i] += utils - value
+        else:
+            regrets[i] = utils - value
+        return value
+
+    if i in strategy_sums:
+        strategy_sums[i] += sigma
+    else:
+        strategy_sums[i] = sigma.copy()
+    child = node.next_nodes[_sample(np.cumsum(sigma).tolist(), rng.random())]
+    return traverse(child, traverser, strategy, rng, regrets, strategy_sums)
+
+def _pack(updates, max_actions):
+    ids = np.fromiter(updates, dtype=np.int64, count=len(updates))
+    rows = np.zeros((len(updates), max_actions))
+    for r, row in enumerate(updates.values()):
+        rows[r, :len(row)] = row
+    return ids, rows
+
+def _init_worker(shared, shape):
+    global _STRATEGY
+    _STRATEGY = np.frombuffer(shared, dtype=np.float64).reshape(shape)
+
+def _run_traversals(args):
+    first_iteration, num_iterations, seed = args
+    rng = random.Random(seed)
+    random.seed(seed)   # openCFR's DynamicUtility draws from the global generator
+    regrets, strategy_sums = {}, {}
+    for t in range(first_iteration, first_iteration + num_iterations):
+        traverse(_ROOT, t % 2, _STRATEGY, rng, regrets, strategy_sums)
+    return _pack(regrets, _STRATEGY.shape[1]), _pack(strategy_sums, _STRATEGY.shape[1])
+
+# -------------------------------------------------------------------------
+# Exploitability
+# -------------------------------------------------------------------------
+def best_response_value(root, average, player):
+    '''
+    Expected utility for player of a best response to the average strategy (rows indexed by infoset id) of the
+    other player, computed on the full tree.
+    '''
+    groups = {}   # infoset id of player -> [(node, opponent and chance reach)]
+    stack = [(root, 1.0)]
+    while stack:
+        node, reach = stack.pop()
+        if node.is_terminal_node:
+            continue
+        if node.is_chance_node:
+            stack.extend((child, reach * p) for child, p in zip(node.next_nodes, node.chance_probs))
+        elif node.player == player:
+            groups.setdefault(node.infoset_id, []).append((node, reach))
+            stack.extend((child, reach) for child in node.next_nodes)
+        else:
+            stack.extend((child, reach * p) for child, p in zip(node.next_nodes, average[node.infoset_id]))
+
+    best, values = {}, {}
+
+    def value(node):
+        key = id(node)
+        if key in values:
+            return values[key]
+        if node.is_terminal_node:
+            utility = node.terminal_utility.get_utility()
+            v = utility if node.player == player else -utility
+        elif node.is_chance_node:
+            v = sum(p * value(child) for child, p in zip(node.next_nodes, node.chance_probs))
+        elif node.player == player:
+            i = node.infoset_id
+            if i not in best:
+                totals = np.zeros(len(node.next_nodes))
+                for member, reach in groups[i]:
+                    totals += reach * np.array([value(child) for child in member.next_nodes])
+                best[i] = int(np.argmax(totals))
+            v = value(node.next_nodes[best[i]])
+        else:
+            v = sum(p * value(child) for child, p in zip(node.next_nodes, average[node.infoset_id]))
+        values[key] = v
+        return v
+
+    return value(root)
+
+def exploitability(root, table):
+    '''
+    Mean of both players' best-response values against the table's average strategy; zero at a Nash equilibrium of
+    a two-player zero-sum game.
+    '''
+    average = table.average_strategy()
+    return (best_response_value(root, average, 0) + best_response_value(root, average, 1)) / 2
+
+# -------------------------------------------------------------------------
+# Trainer
+# -------------------------------------------------------------------------
+class MCCFRTrainer:
+    '''
+    Runs parallel external-sampling MCCFR on an openCFR game.
+    '''
+
+    def __init__(self, game, processes=None, traversals_per_round=None, plus=False, seed=0):
+        '''
+        Builds and indexes the game tree:
+
+            processes: Worker processes (default one per CPU); 1 traverses in this process.
+            traversals_per_round: Traversals between strategy updates (default 16 per process). Larger rounds merge
+                                  less often but use a staler strategy.
+            plus: Clip negative regrets after every round, as in CFR+.
+            seed: Base seed; each worker task is seeded from (seed, iteration, worker), so a resumed run repeats the
+                  same samples.
+        '''
+        self.game = game
+        self.processes = processes or os.cpu_count() or 1
+        self.traversals_per_round = traversals_per_round or 16 * self.processes
+        self.plus = plus
+        self.seed = seed
+        self.iteration = 0
+        self.history = []   # (iteration, seconds, exploitability or None)
+        self.root = game.build_game_tree()
+        self.table = RegretTable(game.num_actions)
+        self.num_nodes = index_tree(game, self.root, self.table)
+
+    def save(self, path):
+        '''
+        Write a checkpoint: the table rows in use, their keys and actions, and the iteration count.
+        '''
+        t, n = self.table, self.table.size
+        actions = np.full((n, t.max_actions), -1, dtype=np.int64)
+        for i, a in enumerate(t.available_actions):
+            actions[i, :len(a)] = a
+        tmp = path + '.tmp.npz'
+        np.savez_compressed(tmp, iteration=self.iteration, seed=self.seed, keys=np.array(t.keys),
+                            actions=actions, num_actions=t.num_actions[:n], regret_sum=t.regret_sum[:n],
+                            strategy=t.strategy[:n], strategy_sum=t.strategy_sum[:n])
+        os.replace(tmp, path)
+
+    def load(self, path):
+        '''
+        Resume from a checkpoint written by save for the same game.
+        '''
+        with np.load(path) as f:
+            ids = [self.table.ids.get(str(key)) for key in f['keys']]
+            if None in ids or len(ids) != self.table.size:
+                raise ValueError(f"{path} does not match the infosets of this game")
+            for name in ('regret_sum', 'strategy', 'strategy_sum'):
+                getattr(self.table, name)[ids] = f[name]
+            self.iteration = int(f['iteration'])
+            self.seed = int(f['seed'])
+
+    def _round_tasks(self, count):
+        per_worker = -(-count // self.processes)
+        tasks, start = [], self.iteration
+        for w in range(self.processes):
+            k = min(per_worker, self.iteration + count - start)
+            if k <= 0:
+                break
+            tasks.append((start, k, hash((self.seed, self.iteration, w)) & 0xFFFFFFFF))
+            start += k
+        return tasks
+
+    def _merge(self, results):
+        for (regret_ids, regret_rows), (strategy_ids, strategy_rows) in results:
+            self.table.add_regrets(regret_ids, regret_rows)
+            self.table.add_strategy(strategy_ids, strategy_rows)
+        if self.plus:
+            self.table.reset_regret()
+        self.table.strategy[:self.table.size] = self.table.regret_matching()
+
+    def train(self, iterations, checkpoint_path=None, checkpoint_every=10000, exploitability_every=None, log=print):
+        '''
+        Run iterations more traversals (the traverser alternates between players), checkpointing every
+        checkpoint_every iterations and measuring exploitability every exploitability_every. Returns history.
+        '''
+        global _ROOT
+        _ROOT = self.root
+        table = self.table
+        shape = (table.size, table.max_actions)
+        shared = mp.RawArray('d', table.size * table.max_actions)
+        strategy = np.frombuffer(shared, dtype=np.float64).reshape(shape)
+        strategy[:] = table.strategy[:table.size]
+        pool = None
+        if self.processes > 1:
+            pool = mp.get_context('fork').Pool(self.processes, _init_worker, (shared, shape))
+        else:
+            _init_worker(shared, shape)
+
+        end = self.iteration + iterations
+        next_checkpoint = self.iteration + checkpoint_every
+        next_report = self.iteration + (exploitability_every or iterations)
+        start, done = time.perf_counter(), 0
+        try:
+            while self.iteration < end:
+                tasks = self._round_tasks(min(self.traversals_per_round, end - self.iteration))
+                results = pool.map(_run_traversals, tasks) if pool else [_run_traversals(t) for t in tasks]
+                self._merge(results)
+                strategy[:] = table.strategy[:table.size]
+                count = sum(k for _, k, _ in tasks)
+                self.iteration += count
+                done += count
+                if checkpoint_path and self.iteration >= next_checkpoint:
+                    self.save(checkpoint_path)
+                    next_checkpoint += checkpoint_every
+                if self.iteration >= next_report or self.iteration == end:
+                    elapsed = time.perf_counter() - start
+                    expl = exploitability(self.root, table) if exploitability_every else None
+                    self.history.append((self.iteration, elapsed, expl))
+                    if log:
+                        line = f"iteration {self.iteration:,}: {done / elapsed:,.0f} iterations/s"
+                        log(line + (f", exploitability {expl:.4f}" if expl is not None else ""))
+                    next_report += exploitability_every or iterations
+        finally:
+            if pool:
+                pool.close()
+                pool.join()
+        if checkpoint_path:
+            self.save(checkpoint_path)
+        return self.history
+
+if __name__ == '__main__':
+    import contextlib
+    import io
+    from openCFR.games.sample_games import Kuhn
+
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    processes = int(sys.argv[2]) if len(sys.argv) > 2 else os.cpu_count() or 1
+    checkpoint_dir = sys.argv[3] if len(sys.argv) > 3 else '.'
+    with contextlib.redirect_stdout(io.StringIO()):   # Kuhn.build_game_tree prints every terminal history
+        trainer = MCCFRTrainer(Kuhn(), processes=processes)
+    print(f"Kuhn: {trainer.num_nodes} nodes, {len(trainer.table)} infosets, {processes} process(es)")
+    path = os.path.join(checkpoint_dir, 'kuhn_mccfr.npz')
+    if os.path.exists(path):
+        trainer.load(path)
+        print(f"resumed from {path} at iteration {trainer.iteration:,}")
+    trainer.train(iterations, path, checkpoint_every=iterations // 4, exploitability_every=iterations // 10)
+    for key in sorted(trainer.table):
+        print(f"  {key}: {np.round(trainer.table[key].get_average_strategy(), 3)}")
@@ -0,0 +1,152 @@
+"""
+Chunked binary log of self-play decisions.
+
+Each record has a fixed layout (RECORD): 7 card indices (2 hole + 5 board,
+rank * 4 + suit, -1 where absent), street, seat, the action taken, pot, both
+stacks and the teacher's fold/call/raise probabilities. 34 bytes replace a
+JSON line of several hundred. ChunkWriter buffers records in memory and
+appends them a chunk at a time. A chunk is a header (magic, record count,
+games completed so far, CRC-32 of the payload) followed by the packed
+records. A writer only cuts chunks between games, and reopening a file
+truncates any torn chunk at the end, so a crashed run resumes from the last
+complete chunk and knows how many games it had logged. iter_chunks streams
+the chunks back as NumPy structured arrays.
+
+    python selfplay_log.py log_dir
+"""
+import os
+import struct
+import sys
+import zlib
+
+import numpy as np
+
+RECORD = np.dtype([
+    ('cards', 'i1', 7),
+    ('street', 'i1'),     # 0 preflop .. 3 river
+    ('seat', 'i1'),
+    ('action', 'i1'),     # 0 fold, 1 call, 2 raise
+    ('pot', '<f4'),
+    ('stacks', '<f4', 2),
+    ('probs', '<f4', 3),  # teacher fold / call / raise
+])
+MAGIC = b'SPLG'
+_CHUNK = struct.Struct('<4sIQI')   # magic, records, games so far, crc32
+
+RANKS = '23456789TJQKA'
+SUITS = 'HDCS'
+CARD_INDEX = {s + r: i * 4 + j for i, r in enumerate(RANKS) for j, s in enumerate(SUITS)}   # PyPokerEngine 'HA'
+STREETS = {'preflop': 0, 'flop': 1, 'turn': 2, 'river': 3, 'showdown': 3}
+
+def card_indices(hole_cards, community_cards):
+    cards = [-1] * 7
+    for i, c in enumerate(hole_cards[:2]):
+        cards[i] = CARD_INDEX[c]
+    for i, c in enumerate(community_cards[:5]):
+        cards[2 + i] = CARD_INDEX[c]
+    return cards
+
+def scan(path):
+    '''
+    (bytes of complete chunks, records, games) of a log file; a torn or corrupt chunk ends the scan.
+    '''
+    good = records = games = 0
+    if not os.path.exists(path):
+        return 0, 0, 0
+    with open(path, 'rb') as f:
+        while True:
+            header = f.read(_CHUNK.size)
+            if len(header) < _CHUNK.size:
+                break
+            magic, n, chunk_games, crc = _CHUNK.unpack(header)
+            payload = f.read(n * RECORD.itemsize)
+            if magic != MAGIC or len(payload) < n * RECORD.itemsize or zlib.crc32(payload) != crc:
+                break
+            good = f.tell()
+            records += n
+            games = chunk_games
+    return good, records, games
+
+class ChunkWriter:
+    '''
+    Appends records to a log file in chunks of about chunk_records. Opening an existing file keeps its complete
+    chunks and drops a torn tail; games is then the number of games already logged.
+    '''
+
+    def __init__(self, path, chunk_records=4096):
+        self.path = path
+        self.chunk_records = chunk_records
+        size, self.records, self.games = scan(path)
+        self._file = open(path, 'r+b' if os.path.exists(path) else 'wb')
+        self._file.truncate(size)
+        self._file.seek(size)
+        self._buffer = []
+        self._complete = 0   # buffered records of finished games
+
+    def append(self, cards, street, seat, action, pot, stacks, probs):
+        self._buffer.append((cards, street, seat, action, pot, stacks, probs))
+
+    def end_game(self):
+        '''
+        Mark a game boundary, writing a chunk once enough records are buffered.
+        '''
+        self.games += 1
+        self._complete = len(self._buffer)
+        if len(self._buffer) >= self.chunk_records:
+            self._write_chunk()
+
+    def _write_chunk(self):
+        payload = np.array(self._buffer, dtype=RECORD).tobytes()
+        self._file.write(_CHUNK.pack(MAGIC, len(self._buffer), self.games, zlib.crc32(payload)) + payload)
+        self._file.flush()
+        self.records += len(self._buffer)
+        self._buffer = []
+        self._complete = 0
+
+    def close(self):
+        '''
+        Write the records of completed games and close the file; records of an unfinished game are dropped.
+        '''
+        del self._buffer[self._complete:]
+        if self._buffer:
+            self._write_chunk()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def iter_chunks(path):
+    '''
+    Yield each complete chunk of a log file (or of every .bin file in a directory) as a RECORD array.
+    '''
+    if os.path.isdir(path):
+        for name in sorted(os.listdir(path)):
+            if name.endswith('.bin'):
+                yield from iter_chunks(os.path.join(path, name))
+        return
+    with open(path, 'rb') as f:
+        while True:
+            header = f.read(_CHUNK.size)
+            if len(header) < _CHUNK.size:
+                return
+            magic, n, _, crc = _CHUNK.unpack(header)
+            payload = f.read(n * RECORD.itemsize)
+            if magic != MAGIC or len(payload) < n * RECORD.itemsize or zlib.crc32(payload) != crc:
+                return
+            yield np.frombuffer(payload, dtype=RECORD)
+
+def read_records(path):
+    chunks = list(iter_chunks(path))
+    return np.concatenate(chunks) if chunks else np.zeros(0, dtype=RECORD)
+
+if __name__ == '__main__':
+    records = read_records(sys.argv[1])
+    print(f"{len(records):,} decisions, {records.nbytes:,} bytes")
+    for street in range(4):
+        mask = records['street'] == street
+        if mask.any():
+            print(f"  street {street}: {mask.sum():,} decisions, mean teacher fold/call/raise "
+                  f"{np.round(records['probs'][mask].mean(axis=0), 3)}")
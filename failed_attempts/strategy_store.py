@@ -0,0 +1,180 @@
+"""
+Memory-mapped store of a pretrained openCFR strategy.
+
+convert() flattens a dict of InformationSet objects (e.g. openCFR's
+TexasHoldEm_final.pickle) into one binary file. The file holds every average
+strategy in a single float64 array with per-infoset offsets, the matching
+action tokens, and an open-addressing hash index over the UTF-8 infoset keys.
+StrategyStore maps that file read-only and answers get_average_strategy(key)
+with one hash, a probe or two and an array view. Opening it builds no Python
+objects, and every process that maps the file shares one copy through the OS
+page cache.
+
+    python strategy_store.py [infosets.pickle] [out.strategy]
+"""
+from hashlib import blake2b
+import mmap
+import os
+import pickle
+import struct
+import sys
+import time
+
+import numpy as np
+
+MAGIC = b'CFRSTRAT'
+VERSION = 1
+_HEADER = struct.Struct('<8sIIqqqq')   # magic, version, pad, infosets, probs, table slots, key bytes
+EMPTY = -1
+
+def key_hash(key):
+    return int.from_bytes(blake2b(key, digest_size=8).digest(), 'little')
+
+def _layout(num_infosets, num_probs, table_size, key_bytes):
+    # (name, dtype, length) of each section, in file order, each 8-byte aligned
+    sections = [('offsets', np.int64, num_infosets + 1), ('probs', np.float64, num_probs),
+                ('actions', np.int16, num_probs), ('hashes', np.uint64, num_infosets),
+                ('key_offsets', np.int64, num_infosets + 1), ('table', np.int32, table_size),
+                ('keys', np.uint8, key_bytes)]
+    pos, out = _HEADER.size, []
+    for name, dtype, length in sections:
+        pos = (pos + 7) & ~7
+        out.append((name, dtype, length, pos))
+        pos += np.dtype(dtype).itemsize * length
+    return out, pos
+
+def convert(infosets, path):
+    '''
+    Write the average strategies of a {key: InformationSet} dict to path.
+    '''
+    keys = [k.encode() for k in infosets]
+    strategies = [np.asarray(info.get_average_strategy(), dtype=np.float64) for info in infosets.values()]
+    actions = [np.asarray(info.available_actions, dtype=np.int16) for info in infosets.values()]
+    n = len(keys)
+    offsets = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum([len(s) for s in strategies], out=offsets[1:])
+    key_offsets = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum([len(k) for k in keys], out=key_offsets[1:])
+    hashes = np.array([key_hash(k) for k in keys], dtype=np.uint64)
+
+    table_size = 1 << max(2 * n - 1, 1).bit_length()   # load factor <= 1/2
+    mask = table_size - 1
+    table = np.full(table_size, EMPTY, dtype=np.int32)
+    for i, h in enumerate(hashes.tolist()):
+        slot = h & mask
+        while table[slot] != EMPTY:
+            slot = (slot + 1) & mask
+        table[slot] = i
+
+    arrays = {
+        'offsets': offsets, 'probs': np.concatenate(strategies) if n else np.zeros(0),
+        'actions': np.concatenate(actions) if n else np.zeros(0, dtype=np.int16),
+        'hashes': hashes, 'key_offsets': key_offsets, 'table': table,
+        'keys': np.frombuffer(b''.join(keys), dtype=np.uint8),
+    }
+    layout, size = _layout(n, int(offsets[-1]), table_size, int(key_offsets[-1]))
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(_HEADER.pack(MAGIC, VERSION, 0, n, int(offsets[-1]), table_size, int(key_offsets[-1])))
+        for name, dtype, length, pos in layout:
+            f.write(b'\0' * (pos - f.tell()))
+            f.write(np.ascontiguousarray(arrays[name], dtype=dtype).tobytes())
+        f.truncate(size)
+    os.replace(tmp, path)
+
+class StrategyStore:
+    '''
+    Read-only, memory-mapped view of a converted strategy file.
+    '''
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, _, n, num_probs, table_size, key_bytes = _HEADER.unpack_from(self._mmap)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} strategy file")
+        layout, _ = _layout(n, num_probs, table_size, key_bytes)
+        for name, dtype, length, pos in layout:
+            setattr(self, name, np.frombuffer(self._mmap, dtype=dtype, count=length, offset=pos))
+        self._mask = table_size - 1
+        self._keys = memoryview(self._mmap)[layout[-1][3]:layout[-1][3] + key_bytes]
+
+    def __len__(self):
+        return len(self.hashes)
+
+    def index(self, key):
+        '''
+        Row of key in the store, or -1.
+        '''
+        key = key.encode()
+        h = key_hash(key)
+        slot = h & self._mask
+        while True:
+            i = int(self.table[slot])
+            if i == EMPTY:
+                return EMPTY
+            if self.hashes[i] == h and self._keys[self.key_offsets[i]:self.key_offsets[i + 1]] == key:
+                return i
+            slot = (slot + 1) & self._mask
+
+    def __contains__(self, key):
+        return self.index(key) != EMPTY
+
+    def get_average_strategy(self, key, default=None):
+        '''
+        The average strategy at key as a read-only float64 view, or default.
+        '''
+        i = self.index(key)
+        if i == EMPTY:
+            return default
+        return self.probs[self.offsets[i]:self.offsets[i + 1]]
+
+    def available_actions(self, key):
+        i = self.index(key)
+        if i == EMPTY:
+            return None
+        return self.actions[self.offsets[i]:self.offsets[i + 1]]
+
+def pretrained_path(name='TexasHoldEm_final.pickle'):
+    from importlib import resources
+    return str(resources.files('openCFR').joinpath('pretrained', name))
+
+def open_pretrained(path=None, pickle_path=None):
+    '''
+    StrategyStore for openCFR's pretrained hold'em strategy, converting the
+    pickle next to this file on first use.
+    '''
+    path = path or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'TexasHoldEm_final.strategy')
+    if not os.path.exists(path):
+        with open(pickle_path or pretrained_path(), 'rb') as f:
+            convert(pickle.load(f), path)
+    return StrategyStore(path)
+
+if __name__ == '__main__':
+    pickle_path = sys.argv[1] if len(sys.argv) > 1 else pretrained_path()
+    out_path = sys.argv[2] if len(sys.argv) > 2 else 'TexasHoldEm_final.strategy'
+    start = time.perf_counter()
+    with open(pickle_path, 'rb') as f:
+        infosets = pickle.load(f)
+    load_time = time.perf_counter() - start
+    convert(infosets, out_path)
+    start = time.perf_counter()
+    store = StrategyStore(out_path)
+    open_time = time.perf_counter() - start
+    print(f"{len(store):,} infosets: pickle {os.path.getsize(pickle_path):,} bytes loaded in {load_time:.2f}s, "
+          f"store {os.path.getsize(out_path):,} bytes opened in {open_time * 1e3:.2f} ms")
+
+    keys = list(infosets)
+    for key in keys:
+        assert np.array_equal(store.get_average_strategy(key), infosets[key].get_average_strategy())
+    assert store.get_average_strategy('no such key') is None
+    start = time.perf_counter()
+    for key in keys:
+        infosets[key].get_average_strategy()
+    dict_time = (time.perf_counter() - start) / len(keys)
+    start = time.perf_counter()
+    for key in keys:
+        store.get_average_strategy(key)
+    store_time = (time.perf_counter() - start) / len(keys)
+    print(f"lookups match; {store_time * 1e6:.1f} us per store lookup vs "
+          f"{dict_time * 1e6:.1f} us for dict + InformationSet.get_average_strategy")
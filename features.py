@@ -0,0 +1,77 @@
+"""
+Compact decision encoding shared by training (simple_model.py) and inference
+(simple_model_test.py, lockstep.py).
+
+A decision is 7 int8 card indices (2 hole + 5 board, rank * 4 + suit, -1 where
+absent) plus 4 float32 features (pot, hero stack, opponent stack, board size):
+23 bytes instead of the 432 of the 108-float one-hot row. The one-hot expansion
+happens in the model graph (model_layers.CardExpansion); expand() gives the same
+108-float row in NumPy for models that take it as input, e.g. poker_bot.h5.
+Card strings are accepted in both conventions, 'Ah' (hand histories) and 'HA'
+(PyPokerEngine).
+"""
+import numpy as np
+
+RANKS = '23456789TJQKA'
+SUITS = 'hdcs'
+NUM_CARDS = 52
+HOLE_SLOTS = 2
+BOARD_SLOTS = 5
+CARD_SLOTS = HOLE_SLOTS + BOARD_SLOTS
+NUM_FEATS = 4           # pot, hero stack, opponent stack, board size
+EXPANDED_SIZE = 2 * NUM_CARDS + NUM_FEATS
+
+# 'Ah' and 'HA' both map to rank * 4 + suit
+CARD_INDEX = {}
+for _r, _rank in enumerate(RANKS):
+    for _s, _suit in enumerate(SUITS):
+        CARD_INDEX[_rank + _suit] = CARD_INDEX[_suit.upper() + _rank] = _r * 4 + _s
+
+def card_indices(cards, slots):
+    '''
+    Card strings as a list of slots indices, padded with -1.
+    '''
+    out = [CARD_INDEX[c] for c in cards]
+    return out + [-1] * (slots - len(out))
+
+def encode_batch(hole, board, pot, hero_stack, opp_stack, cards=None, feats=None):
+    '''
+    Encode N decisions. hole is (N, 2) and board (N, 5) card indices with -1 where
+    absent; pot, hero_stack and opp_stack are length-N. Writes into cards (N, 7)
+    int8 and feats (N, 4) float32, allocating them when not given, and returns both.
+    '''
+    board = np.asarray(board)
+    n = len(board)
+    if cards is None:
+        cards = np.empty((n, CARD_SLOTS), dtype=np.int8)
+    if feats is None:
+        feats = np.empty((n, NUM_FEATS), dtype=np.float32)
+    cards[:, :HOLE_SLOTS] = hole
+    cards[:, HOLE_SLOTS:] = board
+    feats[:, 0] = pot
+    feats[:, 1] = hero_stack
+    feats[:, 2] = opp_stack
+    feats[:, 3] = (board >= 0).sum(axis=1)
+    return cards, feats
+
+def expand(cards, feats):
+    '''
+    The (N, 108) float32 rows the compact encoding stands for: hole one-hot,
+    board one-hot, then the features.
+    '''
+    n = len(cards)
+    x = np.zeros((n, EXPANDED_SIZE), dtype=np.float32)
+    rows, slots = np.nonzero(cards >= 0)
+    idx = cards[rows, slots].astype(np.int64)
+    x[rows, np.where(slots < HOLE_SLOTS, idx, NUM_CARDS + idx)] = 1.0
+    x[:, 2 * NUM_CARDS:] = feats
+    return x
+
+def model_inputs(model, cards, feats):
+    '''
+    What model.predict takes: [cards, feats] for a model built on the compact
+    encoding (two inputs), the expanded rows for a 108-input model.
+    '''
+    if len(getattr(model, 'inputs', None) or ()) == 2:
+        return [cards, feats]
+    return expand(cards, feats)
@@ -0,0 +1,188 @@
+"""
+Table-driven 7-card hand evaluator with the same rank values as treys
+(1 = royal flush ... 7462 = worst high card; lower is better).
+
+Non-flush hands are looked up by a perfect hash of their rank multiset (the sum of
+per-rank keys is unique for every 7-card multiset); flushes are looked up by the
+13-bit rank mask of the flush suit. Both tables live in one binary file that is
+built on first use and memory-mapped at import. Cards are indices rank * 4 + suit.
+"""
+import itertools
+import os
+import sys
+import time
+
+import numpy as np
+from treys import Card, Evaluator
+from treys.lookup import LookupTable
+
+RANKS = '23456789TJQKA'
+SUITS = 'hdcs'
+# card index = rank * 4 + suit, same layout as features.CARD_INDEX
+ALL_CARDS = [r + s for r in RANKS for s in SUITS]
+INDEX_TO_TREYS = [Card.new(c) for c in ALL_CARDS]
+TREYS_TO_INDEX = {c: i for i, c in enumerate(INDEX_TO_TREYS)}
+
+TABLE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'hand_eval_tables.npy')
+
+# per-rank keys whose sums are unique over all 7-card rank multisets
+RANK_KEYS = np.array([0, 1, 5, 22, 98, 453, 2031, 8698, 22854, 83661, 262349, 636345, 1479181], dtype=np.int32)
+FLUSH_SIZE = 1 << 13
+NONFLUSH_SIZE = int(RANK_KEYS[-1]) * 4 + int(RANK_KEYS[-2]) * 3 + 1
+
+_RANK_KEY_LIST = RANK_KEYS.tolist()
+_CARD_RANK_KEY = RANK_KEYS[np.arange(52) >> 2]
+_CARD_SUIT_KEY = np.left_shift(1, 3 * (np.arange(52) & 3)).astype(np.int32)
+_CARD_BIT = np.left_shift(1, np.arange(52) >> 2).astype(np.int32)
+
+def treys_to_index(cards):
+    return [TREYS_TO_INDEX[c] for c in cards]
+
+def _build_flush_suit():
+    # suit key sums pack four 3-bit suit counts; map each sum to its flush suit or -1
+    table = np.full(1 << 12, -1, dtype=np.int8)
+    for counts in itertools.product(range(8), repeat=4):
+        if sum(counts) <= 7 and max(counts) >= 5:
+            table[sum(c << 3 * s for s, c in enumerate(counts))] = counts.index(max(counts))
+    return table
+
+_FLUSH_SUIT = _build_flush_suit()
+
+def build_tables(path=TABLE_PATH):
+    """
+    Compute the flush and non-flush tables from treys' 5-card lookup tables and save
+    them as one int16 array: [flush table (8192) | non-flush table].
+    """
+    lookup = LookupTable()
+    primes = Card.PRIMES
+    table = np.zeros(FLUSH_SIZE + NONFLUSH_SIZE, dtype=np.int16)
+    for n in (5, 6, 7):
+        for ranks in itertools.combinations(range(13), n):
+            mask = sum(1 << r for r in ranks)
+            table[mask] = min(lookup.flush_lookup[primes[a] * primes[b] * primes[c] * primes[d] * primes[e]]
+                              for a, b, c, d, e in itertools.combinations(ranks, 5))
+    for ranks in itertools.combinations_with_replacement(range(13), 7):
+        if max(ranks.count(r) for r in ranks) > 4:
+            continue
+        key = int(RANK_KEYS[list(ranks)].sum())
+        table[FLUSH_SIZE + key] = min(lookup.unsuited_lookup[primes[a] * primes[b] * primes[c] * primes[d] * primes[e]]
+                                      for a, b, c, d, e in itertools.combinations(ranks, 5))
+    np.save(path, table)
+    return table
+
+def load_tables(path=TABLE_PATH):
+    if not os.path.exists(path):
+        build_tables(path)
+    # plain ndarray views of the mapping skip np.memmap's per-lookup overhead
+    table = np.load(path, mmap_mode='r').view(np.ndarray)
+    return table[:FLUSH_SIZE], table[FLUSH_SIZE:]
+
+_FLUSH, _NONFLUSH = load_tables()
+
+def evaluate_batch(cards):
+    """
+    Treys rank of every row of an (M, 7) array of card indices.
+    """
+    cards = np.asarray(cards)
+    flush_suit = _FLUSH_SUIT[_CARD_SUIT_KEY[cards].sum(axis=1)]
+    ranks = _NONFLUSH[_CARD_RANK_KEY[cards].sum(axis=1)]
+    is_flush = flush_suit >= 0
+    if not is_flush.any():
+        return ranks
+    flush_cards = cards[is_flush]
+    in_suit = (flush_cards & 3) == flush_suit[is_flush, None]
+    flush_mask = np.bitwise_or.reduce(np.where(in_suit, _CARD_BIT[flush_cards], 0), axis=1)
+    ranks = np.array(ranks)
+    ranks[is_flush] = _FLUSH[flush_mask]
+    return ranks
+
+def evaluate_index(cards):
+    """
+    Treys rank of seven card indices.
+    """
+    suit_counts = [0, 0, 0, 0]
+    key = 0
+    for c in cards:
+        suit_counts[c & 3] += 1
+        key += _RANK_KEY_LIST[c >> 2]
+    for suit, count in enumerate(suit_counts):
+        if count >= 5:
+            return int(_FLUSH[sum(1 << (c >> 2) for c in cards if c & 3 == suit)])
+    return int(_NONFLUSH[key])
+
+_TREYS_EVALUATOR = None
+
+def evaluate(hole, board):
+    """
+    Drop-in for treys.Evaluator().evaluate(hole, board) on treys card ints.
+    Hands with fewer than seven cards are passed through to treys.
+    """
+    global _TREYS_EVALUATOR
+    if len(hole) + len(board) != 7:
+        if _TREYS_EVALUATOR is None:
+            _TREYS_EVALUATOR = Evaluator()
+        return _TREYS_EVALUATOR.evaluate(hole, board)
+    return evaluate_index(treys_to_index(hole + board))
+
+# -------------------------------------------------------------------------
+# Validation against treys
+# -------------------------------------------------------------------------
+def _check(evaluator, hands):
+    expected = np.array([evaluator.evaluate([INDEX_TO_TREYS[c] for c in h[:2]],
+                                            [INDEX_TO_TREYS[c] for c in h[2:]]) for h in hands])
+    batch = evaluate_batch(hands)
+    single = np.array([evaluate_index(h) for h in hands.tolist()])
+    return int((batch != expected).sum() + (single != expected).sum())
+
+def validate_random(num_hands=200000, seed=0):
+    """
+    Compare against treys on uniformly random 7-card hands. Returns the mismatch count.
+    """
+    rng = np.random.default_rng(seed)
+    hands = np.argsort(rng.random((num_hands, 52)), axis=1)[:, :7]
+    return _check(Evaluator(), hands)
+
+def validate_exhaustive():
+    """
+    Compare against treys on one concrete hand for every table entry: all 49,205
+    non-flush rank multisets and every 5-7 card flush rank mask (with the remaining
+    cards filled in off-suit). Returns the mismatch count.
+    """
+    hands = []
+    for ranks in itertools.combinations_with_replacement(range(13), 7):
+        if max(ranks.count(r) for r in ranks) > 4:
+            continue
+        hands.append([r * 4 + s for r, s in zip(ranks, _spread_suits(ranks))])
+    for n in (5, 6, 7):
+        for ranks in itertools.combinations(range(13), n):
+            hand = [r * 4 + 3 for r in ranks]
+            others = [r for r in range(13) if r not in ranks][:7 - n]
+            hands.append(hand + [r * 4 for r in others])
+    return _check(Evaluator(), np.array(hands))
+
+def _spread_suits(ranks):
+    # suits for a rank multiset such that no card repeats and no suit holds five cards
+    used = {}
+    suit_counts = [0, 0, 0, 0]
+    suits = []
+    for r in ranks:
+        taken = used.setdefault(r, set())
+        s = min((s for s in range(4) if s not in taken), key=lambda s: suit_counts[s])
+        taken.add(s)
+        suit_counts[s] += 1
+        suits.append(s)
+    return suits
+
+if __name__ == '__main__':
+    if '--build' in sys.argv:
+        start = time.perf_counter()
+        build_tables()
+        print(f"Built {TABLE_PATH} in {time.perf_counter() - start:.1f}s")
+    print("random mismatches:", validate_random())
+    print("exhaustive mismatches:", validate_exhaustive())
+    rng = np.random.default_rng(1)
+    hands = np.argsort(rng.random((100000, 52)), axis=1)[:, :7]
+    start = time.perf_counter()
+    evaluate_batch(hands)
+    elapsed = time.perf_counter() - start
+    print(f"evaluate_batch: {len(hands) / elapsed:,.0f} hands/s")
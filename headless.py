@@ -0,0 +1,429 @@
+"""
+Headless no-limit Hold'em table for high-volume bot evaluation.
+
+The dealer rotates every hand as in diy_bot.Game, but blinds follow the real
+rules: heads-up the dealer posts the small blind and acts first preflop, where
+diy_bot.Game posts it at dealer + 1. Unlike diy_bot.Game there are full betting
+rounds (raises re-open the action, short all-ins do not), side pots and split
+pots, no printing, preallocated per-seat state and decks dealt in NumPy blocks.
+Every hand starts from fresh stacks so results are per-hand chip deltas.
+
+Policies implement act(table, seat, valid_actions, to_call) -> (action, amount)
+with diy_bot conventions: valid_actions is ['fold', 'call', 'raise'] or
+['check', 'raise'] and amount is the number of chips the action puts in. Existing
+bots plug in through PlayerAdapter (diy_bot.Player) and PPEAdapter
+(pypokerengine BasePokerPlayer).
+"""
+import contextlib
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+import equity
+import hand_eval
+from diy_bot import SMALL_BLIND, BIG_BLIND, INITIAL_STACK
+
+DEAL_BLOCK = 4096
+STREETS = ['preflop', 'flop', 'turn', 'river']
+BOARD_SIZES = [0, 3, 4, 5]
+
+class HeadlessTable:
+    '''
+    A table of 2-6 policies. play_hand() plays one hand and returns the per-seat
+    chip deltas; run() plays many hands with the dealer rotating every hand.
+    stack is the starting stack of every seat, or a list with one per seat.
+    '''
+
+    def __init__(self, policies, small_blind=SMALL_BLIND, big_blind=BIG_BLIND, stack=INITIAL_STACK,
+                 seed=None, deal_block=DEAL_BLOCK):
+        n = len(policies)
+        self.policies = policies
+        self.observers = [p for p in policies if hasattr(p, 'observe')]
+        self.street_observers = [p for p in policies if hasattr(p, 'start_street')]
+        self.num_seats = n
+        self.small_blind = small_blind
+        self.big_blind = big_blind
+        self.starting_stacks = list(stack) if hasattr(stack, '__len__') else [stack] * n
+        self.dealer_idx = 0
+        self.sb_idx, self.bb_idx = 0, 1 % n
+        self.hand_count = 0
+        # per-seat state, reused every hand
+        self.stacks = [0] * n
+        self.street_bets = [0] * n
+        self.committed = [0] * n
+        self.folded = [False] * n
+        self.all_in = [False] * n
+        self.acted = [False] * n
+        self.raise_locked = [False] * n
+        self.num_all_in = 0
+        self.holes = [[0, 0] for _ in range(n)]
+        self.board = []
+        self.street = 0
+        self.current_bet = 0
+        self.min_raise = big_blind
+        self.rng = np.random.default_rng(seed)
+        self.deal_block = deal_block
+        self._deals = []
+        self._next_deal = 0
+
+    @property
+    def pot(self):
+        return sum(self.committed)
+
+    def rotate_dealer(self):
+        self.dealer_idx = (self.dealer_idx + 1) % self.num_seats
+
+    def _deal(self):
+        if self._next_deal == len(self._deals):
+            self._deals = equity.draw_runouts([], 2 * self.num_seats + 5, self.deal_block, self.rng).tolist()
+            self._next_deal = 0
+        deal = self._deals[self._next_deal]
+        self._next_deal += 1
+        return deal
+
+    def _put(self, seat, amount):
+        amount = min(amount, self.stacks[seat])
+        self.stacks[seat] -= amount
+        self.street_bets[seat] += amount
+        self.committed[seat] += amount
+        if self.stacks[seat] == 0 and not self.all_in[seat]:
+            self.all_in[seat] = True
+            self.num_all_in += 1
+        return amount
+
+    def play_hand(self, deal=None):
+        '''
+        deal optionally fixes the cards as a list or array of card indices: seat s
+        gets deal[2s:2s+2], the board is the five cards after the hole cards.
+        '''
+        n = self.num_seats
+        if deal is None:
+            deal = self._deal()
+        elif hasattr(deal, 'tolist'):
+            deal = deal.tolist()
+        for s in range(n):
+            self.stacks[s] = self.starting_stacks[s]
+            self.street_bets[s] = self.committed[s] = 0
+            self.folded[s] = self.all_in[s] = False
+            self.holes[s][0] = deal[2 * s]
+            self.holes[s][1] = deal[2 * s + 1]
+        self.num_all_in = 0
+        board = deal[2 * n:]
+        self.board.clear()
+        self.hand_count += 1
+        self.street = 0
+
+        # heads-up the dealer posts the small blind and acts first preflop
+        sb = self.sb_idx = self.dealer_idx if n == 2 else (self.dealer_idx + 1) % n
+        bb = self.bb_idx = (sb + 1) % n
+        self._put(sb, self.small_blind)
+        self._put(bb, self.big_blind)
+        self.current_bet = self.big_blind
+        # policies see the hand start with the blinds posted, as in PyPokerEngine
+        for p in self.policies:
+            if hasattr(p, 'start_hand'):
+                p.start_hand(self)
+        first = (bb + 1) % n
+        live = n
+        for street in range(4):
+            self.street = street
+            if street > 0:
+                self.board.extend(board[len(self.board):BOARD_SIZES[street]])
+                for s in range(n):
+                    self.street_bets[s] = 0
+                self.current_bet = 0
+                first = (self.dealer_idx + 1) % n
+            for p in self.street_observers:
+                p.start_street(self)
+            live = self._betting_round(first)
+            if live == 1:
+                break
+        return self._settle(board, live)
+
+    def _betting_round(self, first):
+        n = self.num_seats
+        folded, all_in, acted, locked = self.folded, self.all_in, self.acted, self.raise_locked
+        for s in range(n):
+            acted[s] = locked[s] = False
+        self.min_raise = self.big_blind
+        live = n - sum(folded)
+        seat = first
+        idle = 0
+        while idle < n and live > 1:
+            if folded[seat] or all_in[seat] or (acted[seat] and self.street_bets[seat] == self.current_bet):
+                idle += 1
+                seat = (seat + 1) % n
+                continue
+            to_call = self.current_bet - self.street_bets[seat]
+            can_act = live - self.num_all_in
+            if to_call == 0 and can_act == 1:
+                break  # everyone else is all in; nothing left to bet against
+            valid = ['fold', 'call'] if to_call > 0 else ['check']
+            if self.stacks[seat] > to_call and not locked[seat] and can_act > 1:
+                valid.append('raise')
+            action, amount = self.policies[seat].act(self, seat, valid, to_call)
+            if action == 'raise' and 'raise' in valid:
+                action = self._raise(seat, to_call, amount)
+            elif action in ('call', 'raise') or (action == 'check' and to_call == 0):
+                action = 'call' if to_call > 0 else 'check'
+                self._put(seat, to_call)
+            else:
+                action = 'fold'
+                folded[seat] = True
+                live -= 1
+            acted[seat] = True
+            for obs in self.observers:
+                obs.observe(self, seat, action, self.street_bets[seat])
+            idle = 0
+            seat = (seat + 1) % n
+        return live
+
+    def _raise(self, seat, to_call, amount):
+        # amount is the chips put in; short raises are bumped to the minimum raise
+        target = max(self.street_bets[seat] + amount, self.current_bet + self.min_raise)
+        self._put(seat, target - self.street_bets[seat])
+        increment = self.street_bets[seat] - self.current_bet
+        if increment <= 0:
+            return 'call'
+        if increment >= self.min_raise:
+            self.min_raise = increment
+            for s in range(self.num_seats):
+                self.acted[s] = self.raise_locked[s] = False
+        else:
+            # an all-in short of a full raise does not re-open the betting
+            for s in range(self.num_seats):
+                if self.acted[s]:
+                    self.raise_locked[s] = True
+        self.current_bet = self.street_bets[seat]
+        return 'raise'
+
+    def _settle(self, board, live):
+        n = self.num_seats
+        committed, folded = self.committed, self.folded
+        if live == 1:
+            winner = folded.index(False)
+            self.stacks[winner] += sum(committed)
+        else:
+            ranks = [hand_eval.evaluate_index(self.holes[s] + board) if not folded[s] else 0 for s in range(n)]
+            # seats in odd-chip order: first seat left of the dealer gets the extra chips
+            order = [(self.dealer_idx + 1 + i) % n for i in range(n)]
+            levels = sorted(set(committed[s] for s in range(n) if not folded[s]))
+            prev = 0
+            for level in levels:
+                pot = sum(min(c, level) - min(c, prev) for c in committed)
+                eligible = [s for s in order if not folded[s] and committed[s] >= level]
+                best = min(ranks[s] for s in eligible)
+                winners = [s for s in eligible if ranks[s] == best]
+                share, odd = divmod(pot, len(winners))
+                for i, s in enumerate(winners):
+                    self.stacks[s] += share + (i < odd)
+                prev = level
+        deltas = [self.stacks[s] - self.starting_stacks[s] for s in range(n)]
+        for p in self.policies:
+            if hasattr(p, 'end_hand'):
+                p.end_hand(self, deltas)
+        return deltas
+
+    def run(self, num_hands):
+        '''
+        Play num_hands hands; returns an (num_hands, num_seats) int array of chip deltas.
+        '''
+        results = np.zeros((num_hands, self.num_seats), dtype=np.int64)
+        for i in range(num_hands):
+            results[i] = self.play_hand()
+            self.rotate_dealer()
+        return results
+
+# -------------------------------------------------------------------------
+# Simple built-in policies
+# -------------------------------------------------------------------------
+class CallingStation:
+    def act(self, table, seat, valid_actions, to_call):
+        return ('call', to_call) if to_call > 0 else ('check', 0)
+
+class RandomPolicy:
+    def act(self, table, seat, valid_actions, to_call):
+        action = random.choice(valid_actions)
+        if action == 'raise':
+            return 'raise', to_call + table.min_raise
+        return action, to_call if action == 'call' else 0
+
+class Maniac:
+    def act(self, table, seat, valid_actions, to_call):
+        if 'raise' in valid_actions:
+            return 'raise', table.stacks[seat]
+        return 'call', to_call
+
+# -------------------------------------------------------------------------
+# Adapters for the existing bot classes
+# -------------------------------------------------------------------------
+_DEVNULL = None
+
+def quiet_stdout(quiet=True):
+    '''
+    Context manager discarding prints while quiet; os.devnull is opened on first use.
+    '''
+    global _DEVNULL
+    if not quiet:
+        return contextlib.nullcontext()
+    if _DEVNULL is None:
+        _DEVNULL = open(os.devnull, 'w')
+    return contextlib.redirect_stdout(_DEVNULL)
+
+class PlayerAdapter:
+    '''
+    Seats a diy_bot.Player (BaselineBot, RandomPlayer, ...). The player sees treys
+    cards and its stack is kept in sync; its printing is discarded when quiet.
+    '''
+
+    def __init__(self, player, quiet=True):
+        self.player = player
+        self.quiet = quiet
+
+    def act(self, table, seat, valid_actions, to_call):
+        p = self.player
+        p.stack = table.stacks[seat]
+        hole = [hand_eval.INDEX_TO_TREYS[c] for c in table.holes[seat]]
+        board = [hand_eval.INDEX_TO_TREYS[c] for c in table.board]
+        with quiet_stdout(self.quiet):
+            return p.decide(list(valid_actions), hole, board, table.pot, to_call)
+
+def ppe_card(c):
+    return hand_eval.SUITS[c & 3].upper() + hand_eval.RANKS[c >> 2]
+
+class PPEAdapter:
+    '''
+    Seats a pypokerengine BasePokerPlayer (MCPlayer, FishPlayer, ModelPlayer, ...).
+    declare_action gets PyPokerEngine-style valid_actions and round_state, and its
+    reply is interpreted with PyPokerEngine's rules: amounts are street totals and
+    an illegal call or raise is a fold. The player also gets PyPokerEngine's round
+    start, street start, game update and round result messages, with blinds in the
+    action histories and a check recorded as a CALL of 0.
+    '''
+
+    def __init__(self, player, quiet=True):
+        self.player = player
+        self.quiet = quiet
+        self.histories = {street: [] for street in STREETS}
+        self.street_bets = {}    # uuid -> street total, for the 'paid' of each history entry
+        self.street_max = 0
+
+    def _uuid(self, seat):
+        return f'seat{seat}'
+
+    def _seat_info(self, table, s):
+        return {'name': self._uuid(s), 'uuid': self._uuid(s), 'stack': table.stacks[s],
+                'state': 'folded' if table.folded[s] else 'allin' if table.all_in[s] else 'participating'}
+
+    def _round_state(self, table, street=None):
+        n = table.num_seats
+        return {
+            'street': street or STREETS[table.street],
+            'pot': {'main': {'amount': table.pot}, 'side': []},
+            'community_card': [ppe_card(c) for c in table.board],
+            'dealer_btn': table.dealer_idx,
+            'small_blind_pos': table.sb_idx,
+            'big_blind_pos': table.bb_idx,
+            'small_blind_amount': table.small_blind,
+            'round_count': table.hand_count,
+            'seats': [self._seat_info(table, s) for s in range(n)],
+            # the streets reached so far, as PyPokerEngine reports them
+            'action_histories': {street: self.histories[street] for street in STREETS[:table.street + 1]},
+        }
+
+    def start_hand(self, table):
+        # called with the blinds posted
+        for actions in self.histories.values():
+            actions.clear()
+        self.street_bets.clear()
+        for action, s, add in (('SMALLBLIND', table.sb_idx, table.street_bets[table.sb_idx]),
+                               ('BIGBLIND', table.bb_idx, table.street_bets[table.bb_idx] - table.small_blind)):
+            amount = self.street_bets[self._uuid(s)] = table.street_bets[s]
+            self.histories['preflop'].append({'action': action, 'amount': amount, 'add_amount': add,
+                                              'uuid': self._uuid(s)})
+        self.street_max = table.current_bet
+        seat = table.policies.index(self)
+        self.player.set_uuid(self._uuid(seat))
+        hole = [ppe_card(c) for c in table.holes[seat]]
+        with quiet_stdout(self.quiet):
+            self.player.receive_round_start_message(table.hand_count, hole, self._round_state(table)['seats'])
+
+    def start_street(self, table):
+        if table.street > 0:
+            self.street_bets.clear()
+            self.street_max = 0
+        street = STREETS[table.street]
+        with quiet_stdout(self.quiet):
+            self.player.receive_street_start_message(street, self._round_state(table))
+
+    def observe(self, table, seat, action, street_total):
+        uuid = self._uuid(seat)
+        if action == 'fold':
+            entry = {'action': 'FOLD', 'uuid': uuid}
+            amount = 0
+        else:
+            # PyPokerEngine declares and records a check as a call of 0
+            amount = street_total
+            entry = {'action': 'RAISE' if action == 'raise' else 'CALL', 'amount': amount,
+                     'paid': amount - self.street_bets.get(uuid, 0), 'uuid': uuid}
+            if action == 'raise':
+                entry['add_amount'] = amount - self.street_max
+                self.street_max = amount
+            self.street_bets[uuid] = amount
+        self.histories[STREETS[table.street]].append(entry)
+        update = {'player_uuid': uuid, 'action': 'call' if action == 'check' else action, 'amount': amount}
+        with quiet_stdout(self.quiet):
+            self.player.receive_game_update_message(update, self._round_state(table))
+
+    def end_hand(self, table, deltas):
+        # PyPokerEngine ships with every PPE player, so importing it here keeps it optional for the table itself
+        from pypokerengine.engine.card import Card
+        from pypokerengine.engine.hand_evaluator import HandEvaluator
+        live = [s for s in range(table.num_seats) if not table.folded[s]]
+        hand_info = []
+        if len(live) > 1:
+            board = [Card.from_str(ppe_card(c)) for c in table.board]
+            hand_info = [{'uuid': self._uuid(s), 'hand': HandEvaluator.gen_hand_rank_info(
+                [Card.from_str(ppe_card(c)) for c in table.holes[s]], board)} for s in live]
+            ranks = {s: hand_eval.evaluate_index(table.holes[s] + table.board) for s in live}
+            live = [s for s in live if ranks[s] == min(ranks.values())]
+        winners = [self._seat_info(table, s) for s in live]
+        with quiet_stdout(self.quiet):
+            self.player.receive_round_result_message(winners, hand_info, self._round_state(table, 'showdown'))
+
+    def act(self, table, seat, valid_actions, to_call):
+        paid = table.street_bets[seat]
+        all_in = max_raise = paid + table.stacks[seat]
+        min_raise = table.current_bet + table.min_raise
+        can_raise = 'raise' in valid_actions
+        if not can_raise or max_raise < min_raise:
+            min_raise = max_raise = -1
+        ppe_valid = [
+            {'action': 'fold', 'amount': 0},
+            {'action': 'call', 'amount': table.current_bet},
+            {'action': 'raise', 'amount': {'min': min_raise, 'max': max_raise}},
+        ]
+        hole = [ppe_card(c) for c in table.holes[seat]]
+        with quiet_stdout(self.quiet):
+            action, amount = self.player.declare_action(ppe_valid, hole, self._round_state(table))
+        # a short stack may also call for everything it has left
+        if action == 'call' and amount in (table.current_bet, min(table.current_bet, all_in)):
+            return 'call', to_call
+        if action == 'raise' and can_raise and (amount == all_in or min_raise <= amount <= max_raise):
+            return 'raise', amount - paid
+        return 'fold', 0
+
+if __name__ == '__main__':
+    num_hands = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    for label, policies in (('calling stations', [CallingStation(), CallingStation()]),
+                            ('random vs maniac', [RandomPolicy(), Maniac()]),
+                            ('6-max random', [RandomPolicy() for _ in range(6)])):
+        table = HeadlessTable(policies, seed=0)
+        start = time.perf_counter()
+        results = table.run(num_hands)
+        elapsed = time.perf_counter() - start
+        assert (results.sum(axis=1) == 0).all()
+        print(f"{label}: {num_hands / elapsed:,.0f} hands/s, mean chips/hand per seat {results.mean(axis=0).round(2).tolist()}")
@@ -0,0 +1,203 @@
+"""
+Micro-batching inference broker shared by many players.
+
+Each ModelPlayer.declare_action predicts a single row, so with many tables in
+flight the model sees thousands of batch-of-one calls. An InferenceBroker
+wraps a model (Keras or numpy_model.NumpyModel) behind the same predict
+contract: callers on any thread submit their rows, and one worker thread
+concatenates whatever is queued into a single forward pass when max_batch_size
+rows are waiting or max_wait seconds have passed since the first of them, then
+hands each caller its slice. Pass the broker wherever a model goes:
+
+    broker = InferenceBroker(numpy_model.load_model('poker_bot.h5'))
+    players = [ModelPlayer(broker) for _ in range(num_tables)]
+
+batch_sizes and queue_depths count the rows per forward pass and the requests
+still queued behind each one.
+
+    python inference_broker.py [num_tables] [decisions_per_table]
+"""
+from collections import Counter, deque
+import sys
+import threading
+import time
+
+import numpy as np
+
+class _Batch:
+    __slots__ = ('xs', 'rows', 'first', 'done', 'out', 'error')
+
+    def __init__(self):
+        self.xs = []
+        self.rows = 0
+        self.first = None      # arrival time of the first request
+        self.done = threading.Event()
+        self.out = self.error = None
+
+class InferenceBroker:
+    '''
+    Batches concurrent predict calls on one model. Inputs are a (rows, ...)
+    array or, for two-input models, a list of arrays; outputs are the model's
+    rows for that input. All callers of a batch wait on one event, so a request
+    costs a lock, an append and a wake-up.
+    '''
+
+    def __init__(self, model, max_batch_size=256, max_wait=0.002):
+        self.model = model
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.inputs = getattr(model, 'inputs', None)   # for features.model_inputs
+        self.batch_sizes = Counter()
+        self.queue_depths = Counter()
+        self._cond = threading.Condition()
+        self._pending = _Batch()
+        self._full = deque()   # batches closed at max_batch_size, waiting for the worker
+        self._closed = False
+        self._worker = threading.Thread(target=self._run, name='inference-broker', daemon=True)
+        self._worker.start()
+
+    def predict(self, x, verbose=0, batch_size=None):
+        rows = len(x[0]) if isinstance(x, (list, tuple)) else len(x)
+        if rows == 0:
+            # nothing to batch, and an empty request would never wake the worker
+            shape = getattr(self.model, 'output_shape', None)   # Keras refuses to predict zero rows
+            if shape is not None:
+                return np.empty((0,) + tuple(shape[1:]), dtype=np.float32)
+            return np.asarray(self.model.predict(x, verbose=0))
+        if rows > self.max_batch_size:
+            # too big for one forward pass: submit it in max_batch_size pieces
+            step = self.max_batch_size
+            if isinstance(x, (list, tuple)):
+                parts = [self.predict([a[i:i + step] for a in x]) for i in range(0, rows, step)]
+            else:
+                parts = [self.predict(x[i:i + step]) for i in range(0, rows, step)]
+            return np.concatenate(parts)
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("InferenceBroker is closed")
+            batch = self._pending
+            if batch.rows + rows > self.max_batch_size:
+                # this request would overfill the batch; queue the batch and start another
+                self._full.append(batch)
+                batch = self._pending = _Batch()
+            start = batch.rows
+            batch.xs.append(x)
+            batch.rows += rows
+            if start == 0 or batch.rows >= self.max_batch_size:
+                if start == 0:
+                    batch.first = time.perf_counter()
+                self._cond.notify()
+        batch.done.wait()
+        if batch.error is not None:
+            raise batch.error
+        return batch.out[start:start + rows]
+
+    __call__ = predict
+
+    def close(self):
+        '''
+        Flush what is queued and stop the worker thread.
+        '''
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self._worker.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _next_batch(self):
+        with self._cond:
+            while not self._full and not self._pending.rows and not self._closed:
+                self._cond.wait()
+            if self._full:
+                return self._full.popleft()
+            batch = self._pending
+            while batch.rows and batch.rows < self.max_batch_size and not self._closed:
+                timeout = batch.first + self.max_wait - time.perf_counter()
+                if timeout <= 0:
+                    break
+                self._cond.wait(timeout)
+            if self._full and self._full[0] is batch:
+                # a caller queued it while we waited
+                return self._full.popleft()
+            self._pending = _Batch()
+            return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if not batch.rows:
+                return    # closed and drained
+            self.batch_sizes[batch.rows] += 1
+            self._flush(batch)
+            # requests that queued up behind this forward pass
+            self.queue_depths[sum(len(b.xs) for b in self._full) + len(self._pending.xs)] += 1
+
+    def _flush(self, batch):
+        xs = batch.xs
+        if isinstance(xs[0], (list, tuple)):
+            inputs = [np.concatenate(parts) for parts in zip(*xs)]
+        else:
+            inputs = np.concatenate(xs)
+        try:
+            batch.out = np.asarray(self.model.predict(inputs, verbose=0))
+        except Exception as e:
+            batch.error = e
+        batch.done.set()
+
+    def mean_batch_size(self):
+        passes = sum(self.batch_sizes.values())
+        return sum(k * v for k, v in self.batch_sizes.items()) / max(passes, 1)
+
+def histogram(counts, buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256, 512)):
+    '''
+    A Counter of sizes folded into power-of-two buckets, as {'<=b': count}.
+    '''
+    out = {}
+    for size, count in counts.items():
+        label = next((f'<={b}' for b in buckets if size <= b), f'>{buckets[-1]}')
+        out[label] = out.get(label, 0) + count
+    return {b: out[b] for b in [f'<={b}' for b in buckets] + [f'>{buckets[-1]}'] if b in out}
+
+# -------------------------------------------------------------------------
+# Benchmark: one thread per table, each predicting one decision at a time
+# -------------------------------------------------------------------------
+def _run_tables(model, rows, num_tables, decisions):
+    def table(t):
+        for d in range(decisions):
+            model.predict(rows[(t * decisions + d) % len(rows)][None])
+    threads = [threading.Thread(target=table, args=(t,)) for t in range(num_tables)]
+    start = time.perf_counter()
+    for th in threads:
+        th.start()
+    for th in threads:
+        th.join()
+    return num_tables * decisions / (time.perf_counter() - start)
+
+if __name__ == '__main__':
+    import numpy_model
+    num_tables = int(sys.argv[1]) if len(sys.argv) > 1 else 128
+    decisions = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    rows = np.random.default_rng(0).random((4096, 108), dtype=np.float32)
+    models = [('NumPy', numpy_model.load_model('poker_bot.h5'))]
+    try:
+        import tensorflow as tf
+        models.append(('Keras', tf.keras.models.load_model('poker_bot.h5')))
+    except ImportError:
+        print("TensorFlow not installed; benchmarking the NumPy model only")
+    for label, model in models:
+        with InferenceBroker(model) as broker:
+            print(f"{label}: a zero-row request returns shape {broker.predict(rows[:0]).shape}")
+        direct = _run_tables(model, rows, num_tables, decisions)
+        print(f"{label}, {num_tables} tables, direct predict: {direct:,.0f} decisions/s")
+        for max_batch_size, max_wait in ((64, 0.001), (256, 0.002), (1024, 0.005)):
+            with InferenceBroker(model, max_batch_size, max_wait) as broker:
+                rate = _run_tables(broker, rows, num_tables, decisions)
+            print(f"  broker (batch <= {max_batch_size}, wait <= {max_wait * 1e3:g} ms): "
+                  f"{rate:,.0f} decisions/s ({rate / direct:.1f}x), mean batch {broker.mean_batch_size():.0f}")
+            print(f"    batch sizes {histogram(broker.batch_sizes)}")
+            print(f"    queue depth {histogram(broker.queue_depths, (0, 1, 4, 16, 64, 256))}")
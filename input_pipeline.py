@@ -0,0 +1,83 @@
+"""
+Streaming tf.data input pipeline over the dataset_cache shards.
+
+make_dataset reads num_readers shards at a time with interleaved parallel
+readers, each walking one memory-mapped shard in blocks of permuted rows. The
+blocks are split into rows, mixed across shards in a bounded shuffle buffer,
+re-batched and prefetched, so memory holds num_readers blocks plus the shuffle
+buffer however large the corpus. Train/val is dataset_cache.split_shards' fixed
+file-level split.
+
+    python input_pipeline.py [cache_dir] [num_readers]
+"""
+import os
+import sys
+import time
+
+import numpy as np
+import tensorflow as tf
+
+import dataset_cache
+import features
+
+BLOCK_ROWS = 1024        # rows per read from a shard
+SHUFFLE_BUFFER = 16384   # rows
+
+SIGNATURE = ((tf.TensorSpec((None, features.CARD_SLOTS), tf.int8),
+              tf.TensorSpec((None, features.NUM_FEATS), tf.float32)),
+             tf.TensorSpec((None,), tf.int8))
+
+def make_dataset(shards, batch_size=128, shuffle=True, num_readers=None,
+                 shuffle_buffer=SHUFFLE_BUFFER, block_rows=BLOCK_ROWS, seed=None):
+    '''
+    tf.data.Dataset of ((cards, feats), y) batches over shards. With shuffle the
+    shard order is redrawn every epoch, each reader permutes its shard's rows and
+    rows are mixed across shards in a shuffle_buffer-row buffer; without it
+    (validation) shards and rows are read in order. num_readers shards (default
+    one per CPU) are read at once, on as many threads.
+    '''
+    num_readers = num_readers or os.cpu_count() or 1
+
+    def read(i, row_seed):
+        rng = np.random.default_rng(int(row_seed) & 0xFFFFFFFFFFFFFFFF)
+        yield from dataset_cache.iter_shard(shards[int(i)], block_rows, shuffle, rng)
+
+    files = tf.data.Dataset.range(len(shards))
+    if shuffle:
+        files = files.shuffle(max(len(shards), 1), seed=seed, reshuffle_each_iteration=True)
+    # one row-permutation seed per shard read, fresh every epoch
+    files = tf.data.Dataset.zip((files, tf.data.Dataset.random(seed=seed)))
+    ds = files.interleave(
+        lambda i, row_seed: tf.data.Dataset.from_generator(read, output_signature=SIGNATURE, args=(i, row_seed)),
+        cycle_length=num_readers, block_length=1, num_parallel_calls=num_readers,
+        deterministic=not shuffle,
+    )
+    ds = ds.unbatch()
+    if shuffle:
+        ds = ds.shuffle(shuffle_buffer, seed=seed, reshuffle_each_iteration=True)
+    return ds.batch(batch_size).prefetch(tf.data.AUTOTUNE)
+
+def train_val_datasets(cache_dir=dataset_cache.CACHE_DIR, batch_size=128, val_fraction=0.2,
+                       num_readers=None, shuffle_buffer=SHUFFLE_BUFFER, seed=None):
+    '''
+    (train, val) datasets over the shards in cache_dir, split by file.
+    '''
+    train, val = dataset_cache.split_shards(dataset_cache.open_shards(cache_dir), val_fraction)
+    return (make_dataset(train, batch_size, True, num_readers, shuffle_buffer, seed=seed),
+            make_dataset(val, batch_size, False, num_readers))
+
+if __name__ == '__main__':
+    cache_dir = sys.argv[1] if len(sys.argv) > 1 else dataset_cache.CACHE_DIR
+    shards = dataset_cache.open_shards(cache_dir)
+    rows = dataset_cache.num_rows(shards)
+    start = time.perf_counter()
+    for _ in dataset_cache.iter_batches(shards, 128):
+        pass
+    print(f"iter_batches: {rows / (time.perf_counter() - start):,.0f} rows/s")
+    readers = [int(sys.argv[2])] if len(sys.argv) > 2 else sorted({1, os.cpu_count() or 1})
+    for num_readers in readers:
+        start = time.perf_counter()
+        for _ in make_dataset(shards, 128, num_readers=num_readers):
+            pass
+        print(f"{num_readers} reader(s): {rows / (time.perf_counter() - start):,.0f} rows/s "
+              f"over {len(shards)} shards")
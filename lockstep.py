@@ -0,0 +1,267 @@
+"""
+Lockstep heads-up simulator: thousands of tables advance one decision at a time.
+
+Per-table state (stacks, bets, pots, boards, hole cards, to-call, street) lives in
+NumPy arrays. Every step each table has exactly one player to act, so a policy
+sees the batch of all tables where its seat is to act and answers with a batch of
+actions; a finished table immediately deals its next hand. Blinds follow the
+heads-up rule, as on headless.HeadlessTable: the dealer posts the small blind,
+acts first preflop and last after the flop, and the button moves every hand.
+(diy_bot.Game instead posts the small blind at dealer + 1.)
+
+Policies implement act(state) -> (actions, amounts) where state is a BatchState,
+actions are FOLD / CALL (check or call) / RAISE (the simple_model label order)
+and amounts are the chips a raise puts in.
+"""
+from collections import namedtuple
+import sys
+import time
+
+import numpy as np
+
+import equity
+import features
+import hand_eval
+from diy_bot import SMALL_BLIND, BIG_BLIND, INITIAL_STACK
+
+FOLD, CALL, RAISE = 0, 1, 2
+BOARD_SIZES = np.array([0, 3, 4, 5])
+
+BatchState = namedtuple('BatchState', [
+    'table',        # table index of each row
+    'hole',         # (B, 2) card indices
+    'board',        # (B, 5) card indices, -1 where not dealt
+    'street',       # 0 preflop ... 3 river
+    'pot',          # chips committed by both players
+    'to_call',
+    'stack',        # acting player's remaining chips
+    'opp_stack',
+    'min_raise',    # chips a minimum raise puts in (capped at stack)
+    'can_raise',
+])
+
+class LockstepTables:
+    '''
+    num_tables heads-up tables; policies[0] always sits in seat 0, policies[1] in seat 1.
+    '''
+
+    def __init__(self, num_tables, policies, small_blind=SMALL_BLIND, big_blind=BIG_BLIND,
+                 stack=INITIAL_STACK, seed=None):
+        t = num_tables
+        self.num_tables = t
+        self.policies = policies
+        self.small_blind = small_blind
+        self.big_blind = big_blind
+        self.stack = stack
+        self.rng = np.random.default_rng(seed)
+        self.rows = np.arange(t)
+        self.dealer_idx = self.rows % 2
+        self.stacks = np.zeros((t, 2), dtype=np.int64)
+        self.street_bets = np.zeros((t, 2), dtype=np.int64)
+        self.committed = np.zeros((t, 2), dtype=np.int64)
+        self.acted = np.zeros((t, 2), dtype=bool)
+        self.holes = np.zeros((t, 2, 2), dtype=np.int16)
+        self.deck_board = np.zeros((t, 5), dtype=np.int16)
+        self.board_len = np.zeros(t, dtype=np.int64)
+        self.street = np.zeros(t, dtype=np.int64)
+        self.current_bet = np.zeros(t, dtype=np.int64)
+        self.min_raise = np.zeros(t, dtype=np.int64)
+        self.to_act = np.zeros(t, dtype=np.int64)
+        self.hands_played = 0
+        self._new_hands(np.ones(t, dtype=bool))
+
+    def rotate_dealer(self, mask):
+        self.dealer_idx[mask] ^= 1
+
+    @property
+    def pot(self):
+        return self.committed.sum(axis=1)
+
+    def boards(self):
+        return np.where(np.arange(5) < self.board_len[:, None], self.deck_board, -1)
+
+    def _new_hands(self, mask):
+        idx = np.nonzero(mask)[0]
+        deal = equity.draw_runouts([], 9, len(idx), self.rng)
+        self.holes[idx] = deal[:, :4].reshape(-1, 2, 2)
+        self.deck_board[idx] = deal[:, 4:]
+        dealer = self.dealer_idx[idx]
+        self.stacks[idx] = self.stack
+        self.street_bets[idx] = 0
+        self.street_bets[idx, dealer] = self.small_blind
+        self.street_bets[idx, 1 - dealer] = self.big_blind
+        self.stacks[idx] -= self.street_bets[idx]
+        self.committed[idx] = self.street_bets[idx]
+        self.acted[idx] = False
+        self.board_len[idx] = 0
+        self.street[idx] = 0
+        self.current_bet[idx] = self.big_blind
+        self.min_raise[idx] = self.big_blind
+        self.to_act[idx] = dealer
+
+    def state(self):
+        rows, s = self.rows, self.to_act
+        to_call = self.current_bet - self.street_bets[rows, s]
+        stack = self.stacks[rows, s]
+        opp_stack = self.stacks[rows, 1 - s]
+        min_raise = np.minimum(to_call + self.min_raise, stack)
+        return BatchState(rows, self.holes[rows, s], self.boards(), self.street.copy(), self.pot,
+                          to_call, stack, opp_stack, min_raise, (stack > to_call) & (opp_stack > 0))
+
+    def step(self):
+        '''
+        One decision at every table. Returns (state, actions, amounts, deltas, finished):
+        deltas are seat-0 chip results for the tables whose hand ended this step.
+        '''
+        rows, s = self.rows, self.to_act
+        o = 1 - s
+        state = self.state()
+        actions = np.full(self.num_tables, CALL, dtype=np.int64)
+        amounts = np.zeros(self.num_tables, dtype=np.int64)
+        for seat, policy in enumerate(self.policies):
+            m = s == seat
+            if m.any():
+                sub = BatchState(*(field[m] for field in state))
+                actions[m], amounts[m] = policy.act(sub)
+
+        to_call, stack = state.to_call, state.stack
+        fold = (actions == FOLD) & (to_call > 0)
+        raise_ = (actions == RAISE) & state.can_raise & ~fold
+        # a raise puts in at least the minimum raise and at most the stack
+        put = np.where(raise_, np.clip(amounts, state.min_raise, stack), np.minimum(to_call, stack))
+        put[fold] = 0
+        self.stacks[rows, s] -= put
+        self.street_bets[rows, s] += put
+        self.committed[rows, s] += put
+        bet = self.street_bets[rows, s]
+        increment = bet - self.current_bet
+        full = raise_ & (increment >= self.min_raise)
+        self.min_raise = np.where(full, increment, self.min_raise)
+        self.current_bet = np.maximum(self.current_bet, bet)
+        self.acted[rows, s] = True
+        self.acted[rows, o] &= ~(raise_ & (increment > 0))
+
+        all_in = (self.stacks[rows, 0] == 0) | (self.stacks[rows, 1] == 0)
+        settled = (self.street_bets[rows, 0] == self.street_bets[rows, 1]) | all_in
+        round_done = ~fold & self.acted[rows, 0] & self.acted[rows, 1] & settled
+        showdown = round_done & (all_in | (self.street == 3))
+        next_street = round_done & ~showdown
+        self.to_act = np.where(round_done, 1 - self.dealer_idx, o)
+
+        if next_street.any():
+            self.street[next_street] += 1
+            self.board_len[next_street] = BOARD_SIZES[self.street[next_street]]
+            self.street_bets[next_street] = 0
+            self.current_bet[next_street] = 0
+            self.min_raise[next_street] = self.big_blind
+            self.acted[next_street] = False
+
+        finished = fold | showdown
+        deltas = np.zeros(self.num_tables, dtype=np.int64)
+        if finished.any():
+            # heads-up, the winner always takes the smaller of the two commitments
+            contested = self.committed.min(axis=1)
+            winner = np.where(fold, o, 0)
+            if showdown.any():
+                idx = np.nonzero(showdown)[0]
+                hands = np.concatenate([self.holes[idx], np.broadcast_to(self.deck_board[idx, None, :], (len(idx), 2, 5))], axis=2)
+                ranks = hand_eval.evaluate_batch(hands.reshape(-1, 7)).reshape(-1, 2)
+                winner[idx] = np.where(ranks[:, 0] < ranks[:, 1], 0, np.where(ranks[:, 0] > ranks[:, 1], 1, -1))
+            deltas = np.where(winner == 0, contested, np.where(winner == 1, -contested, 0)) * finished
+            self.hands_played += int(finished.sum())
+            self.rotate_dealer(finished)
+            self._new_hands(finished)
+        return state, actions, amounts, deltas, finished
+
+    def run(self, num_hands, observer=None):
+        '''
+        Step until num_hands hands have finished; returns their seat-0 chip deltas.
+        observer(state, actions, amounts) is called every step, e.g. to log training data.
+        '''
+        results = np.zeros(num_hands, dtype=np.int64)
+        done = 0
+        while done < num_hands:
+            state, actions, amounts, deltas, finished = self.step()
+            if observer is not None:
+                observer(state, actions, amounts)
+            out = deltas[finished][:num_hands - done]
+            results[done:done + len(out)] = out
+            done += len(out)
+        return results
+
+# -------------------------------------------------------------------------
+# Batch policies
+# -------------------------------------------------------------------------
+class BatchCallingStation:
+    def act(self, state):
+        n = len(state.table)
+        return np.full(n, CALL), np.zeros(n, dtype=np.int64)
+
+class BatchRandom:
+    def __init__(self, seed=None):
+        self.rng = np.random.default_rng(seed)
+
+    def act(self, state):
+        n = len(state.table)
+        actions = self.rng.integers(0, 3, n)
+        return actions, state.min_raise
+
+class BatchEquityPlayer:
+    '''
+    MCPlayer's thresholds on batch equity: fold below 0.40 facing the big blind or
+    below 0.67 * pot odds facing a bet, raise with equity above raise_equity.
+    '''
+
+    def __init__(self, num_sims=100, raise_equity=0.6, seed=None):
+        self.num_sims = num_sims
+        self.raise_equity = raise_equity
+        self.rng = np.random.default_rng(seed)
+
+    def act(self, state):
+        eq = equity.batch_equity(state.hole, state.board, self.num_sims, self.rng)
+        pot_odds = state.to_call / np.maximum(state.pot, 1)
+        fold = ((state.to_call == BIG_BLIND) & (eq < 0.40)) | ((state.to_call > BIG_BLIND) & (eq < pot_odds * 0.67))
+        actions = np.where(fold, FOLD, np.where(eq > self.raise_equity, RAISE, CALL))
+        amounts = np.maximum(state.min_raise, (state.pot * eq).astype(np.int64))
+        return actions, amounts
+
+def encode_states(state):
+    '''
+    features.py's compact encoding of a batch: (cards (N, 7) int8, feats (N, 4)
+    float32), the layout simple_model.py trains on.
+    '''
+    return features.encode_batch(state.hole, state.board, state.pot, state.stack, state.opp_stack)
+
+class BatchModelPlayer:
+    '''
+    A fold/call/raise softmax model (e.g. the Keras net from simple_model.py) that
+    scores every table in one predict call and samples actions like ModelPlayer.
+    '''
+
+    def __init__(self, model, seed=None):
+        self.model = model
+        self.rng = np.random.default_rng(seed)
+
+    def act(self, state):
+        inputs = features.model_inputs(self.model, *encode_states(state))
+        probs = np.asarray(self.model.predict(inputs, verbose=0), dtype=np.float64)
+        probs /= probs.sum(axis=1, keepdims=True)
+        u = self.rng.random(len(probs))[:, None]
+        actions = (u > np.cumsum(probs, axis=1)).sum(axis=1).clip(0, 2)
+        # raise sizes drawn between the minimum raise and 3x pot, as in ModelPlayer
+        high = np.maximum(np.minimum(state.stack, 3 * state.pot), state.min_raise)
+        amounts = self.rng.integers(state.min_raise, high + 1)
+        return actions, amounts
+
+if __name__ == '__main__':
+    num_tables = int(sys.argv[1]) if len(sys.argv) > 1 else 4096
+    num_hands = 100000
+    for label, policies in (('calling stations', [BatchCallingStation(), BatchCallingStation()]),
+                            ('random vs calling station', [BatchRandom(0), BatchCallingStation()]),
+                            ('equity vs random', [BatchEquityPlayer(seed=0), BatchRandom(1)])):
+        tables = LockstepTables(num_tables, policies, seed=0)
+        start = time.perf_counter()
+        results = tables.run(num_hands)
+        elapsed = time.perf_counter() - start
+        bb100 = results.mean() / BIG_BLIND * 100
+        print(f"{label}: {num_hands / elapsed:,.0f} hands/s over {num_tables} tables, seat 0 {bb100:+.1f} bb/100")
@@ -0,0 +1,358 @@
+"""
+Parallel heads-up match evaluation with bb/100 confidence intervals.
+
+Matches are split into shards of a fixed number of hands. Each shard plays on a
+headless.HeadlessTable (PyPokerEngine players through PPEAdapter, diy_bot players
+through PlayerAdapter) with seeds derived from one base seed, so a run is
+reproducible regardless of how many processes execute it. Shards are aggregated
+in index order and the run stops early once the bb/100 standard error reaches the
+requested precision.
+
+Duplicate mode plays every pre-generated deal twice with the seats swapped and the
+bots' RNGs reseeded identically, on the headless table, diy_bot.Game or
+PyPokerEngine's Dealer, and reports the paired per-deal result and its variance.
+How much pairing helps depends on the bots: --check measures it for the
+DUPLICATE_CHECKS pairs on every engine. Luck cancels only where both bots play
+the same cards the same way from either seat.
+
+    python match_harness.py ppe_bot:MCPlayer ppe_bot:FishPlayer --hands 20000 --target-se 10
+    python match_harness.py ppe_bot:MCPlayer ppe_bot:FishPlayer --hands 2000 --duplicate --engine ppe
+    python match_harness.py diy_bot:BaselineBot diy_bot:RandomPlayer --hands 1000 --duplicate --engine diy
+    python match_harness.py --check --hands 1000
+"""
+import argparse
+import ast
+import importlib
+import inspect
+import json
+import multiprocessing as mp
+import random
+import time
+
+import numpy as np
+from pypokerengine.engine.card import Card as PPECard
+from pypokerengine.engine.dealer import Dealer
+from pypokerengine.engine.deck import Deck as PPEDeck
+from pypokerengine.engine.table import Table
+from pypokerengine.players import BasePokerPlayer
+from treys import Deck
+
+import equity
+import equity_cache
+import hand_eval
+import headless
+from diy_bot import SMALL_BLIND, BIG_BLIND, INITIAL_STACK, Game, Player
+
+Z_95 = 1.96
+SHARD_HANDS = 1000
+ENGINES = ('headless', 'diy', 'ppe')
+
+def _spec_arg(module, node):
+    # a Python literal, or another attribute of the module
+    try:
+        return ast.literal_eval(node)
+    except ValueError:
+        pass
+    if isinstance(node, ast.Name) and hasattr(module, node.id):
+        return getattr(module, node.id)
+    raise ValueError(f"{ast.unparse(node)!r} is neither a literal nor an attribute of {module.__name__}")
+
+def parse_spec(spec):
+    '''
+    (factory, args, kwargs) of a player spec; ValueError says what is wrong with a bad one.
+    '''
+    module_name, sep, call = spec.partition(':')
+    try:
+        node = ast.parse(call.strip(), mode='eval').body if sep else None
+    except SyntaxError:
+        node = None
+    if isinstance(node, ast.Call):
+        node, args, keywords = node.func, node.args, node.keywords
+    else:
+        args, keywords = [], []
+    if not isinstance(node, ast.Name) or any(k.arg is None for k in keywords):
+        raise ValueError(f"player spec {spec!r} is not 'module:Name' or 'module:Name(arg, ...)'")
+    try:
+        module = importlib.import_module(module_name)
+    except ImportError as e:
+        raise ValueError(f"player spec {spec!r}: {e}") from None
+    if not hasattr(module, node.id):
+        raise ValueError(f"player spec {spec!r}: {module_name} has no attribute {node.id!r}")
+    return (getattr(module, node.id), [_spec_arg(module, a) for a in args],
+            {k.arg: _spec_arg(module, k.value) for k in keywords})
+
+def build_player(spec):
+    '''
+    Build a player from 'module:Name' or 'module:Name(arg, ..., key=arg)', where
+    each arg is another attribute of the same module or a literal, e.g.
+    'simple_model_test:ModelPlayer(model)' or "diy_bot:BaselineBot('bot, 1', 'parallel')".
+    A constructor that takes a name (diy_bot.Player) gets the spec when the
+    args leave it out.
+    '''
+    factory, args, kwargs = parse_spec(spec)
+    params = list(inspect.signature(factory).parameters)
+    if 'name' in params and 'name' not in kwargs and len(args) <= params.index('name'):
+        kwargs['name'] = spec
+    return factory(*args, **kwargs)
+
+def load_player(spec):
+    '''
+    build_player, wrapped in the matching headless adapter.
+    '''
+    player = build_player(spec)
+    if isinstance(player, BasePokerPlayer):
+        return headless.PPEAdapter(player)
+    if isinstance(player, Player):
+        return headless.PlayerAdapter(player)
+    return player  # already a headless policy
+
+def shard_seeds(base_seed, num_shards):
+    return [int(s.generate_state(1)[0]) for s in np.random.SeedSequence(base_seed).spawn(num_shards)]
+
+def _seed_bots(seed):
+    # bots draw from the global RNGs and equity's module RNG, so seed all of them
+    random.seed(seed)
+    np.random.seed(seed % 2 ** 32)
+    equity.seed(seed)
+
+def _reset_bots(seed):
+    # a shard must not depend on what ran before it in the same worker process
+    equity_cache.SHARED_CACHE.clear()
+    _seed_bots(seed)
+
+def play_shard(hero_spec, villain_spec, num_hands, seed):
+    '''
+    Play num_hands hands and return hero's per-hand chip deltas.
+    '''
+    _reset_bots(seed)
+    table = headless.HeadlessTable([load_player(hero_spec), load_player(villain_spec)], seed=seed)
+    return table.run(num_hands)[:, 0]
+
+# -------------------------------------------------------------------------
+# Duplicate matches
+# -------------------------------------------------------------------------
+INDEX_TO_PPE_ID = [PPECard.from_str(headless.ppe_card(c)).to_id() for c in range(52)]
+# (engine, hero, villain) pairs measured by duplicate_check
+DUPLICATE_CHECKS = [
+    ('headless', 'headless:CallingStation', 'headless:CallingStation'),
+    ('headless', 'ppe_bot:MCPlayer', 'ppe_bot:RampagePlayer'),
+    ('headless', 'diy_bot:BaselineBot', 'diy_bot:RandomPlayer'),
+    ('diy', 'diy_bot:BaselineBot', 'diy_bot:RandomPlayer'),
+    ('diy', 'diy_bot:BaselineBot', 'diy_bot:BaselineBot'),
+    ('ppe', 'ppe_bot:MCPlayer', 'ppe_bot:FishPlayer'),
+    ('ppe', 'ppe_bot:MCPlayer', 'ppe_bot:RampagePlayer'),
+]
+
+def duplicate_deals(num_deals, seed):
+    '''
+    Pre-generated deck orders ((num_deals, 52) card indices, seat s holds cards
+    2s and 2s + 1, the board follows the hole cards) and one bot RNG seed per deal.
+    '''
+    rng = np.random.default_rng(seed)
+    orders = np.argsort(rng.random((num_deals, 52)), axis=1)
+    return orders, rng.integers(0, 2 ** 32, num_deals)
+
+def _duplicate_headless(hero, villain, orders, seeds):
+    tables = [headless.HeadlessTable([hero, villain]), headless.HeadlessTable([villain, hero])]
+    results = np.zeros((len(orders), 2), dtype=np.int64)
+    for i, (order, seed) in enumerate(zip(orders.tolist(), seeds.tolist())):
+        for j, table in enumerate(tables):
+            table.dealer_idx = i % 2
+            # common random numbers: both seatings of a deal see the same bot randomness
+            _seed_bots(seed)
+            results[i, j] = table.play_hand(order[:9])[j]
+    return results
+
+def _duplicate_diy(hero, villain, orders, seeds):
+    games = [Game([hero, villain]), Game([villain, hero])]
+    results = np.zeros((len(orders), 2), dtype=np.int64)
+    for i, (order, seed) in enumerate(zip(orders.tolist(), seeds.tolist())):
+        for j, game in enumerate(games):
+            game.dealer_idx = i % 2
+            hero.stack = villain.stack = INITIAL_STACK
+            deck = Deck()
+            deck.cards = [hand_eval.INDEX_TO_TREYS[c] for c in reversed(order)]  # draw() pops from the end
+            _seed_bots(seed)
+            with headless.quiet_stdout():
+                game.play_hand(deck)
+            results[i, j] = hero.stack - INITIAL_STACK
+    return results
+
+def _duplicate_ppe(hero, villain, orders, seeds):
+    results = np.zeros((len(orders), 2), dtype=np.int64)
+    for i, (order, seed) in enumerate(zip(orders.tolist(), seeds.tolist())):
+        ids = [INDEX_TO_PPE_ID[c] for c in order]
+        for j, players in enumerate(((hero, villain), (villain, hero))):
+            _seed_bots(seed)
+            dealer = Dealer(SMALL_BLIND, INITIAL_STACK)
+            # a cheat deck is dealt in the given order and never shuffled
+            dealer.table = Table(cheat_deck=PPEDeck(cheat=True, cheat_card_ids=ids))
+            dealer.table.dealer_btn = i % 2
+            for k, player in enumerate(players):
+                dealer.register_player(f'p{k}', player)
+            with headless.quiet_stdout():
+                message = dealer.start_game(1)
+            results[i, j] = message['message']['game_information']['seats'][j]['stack'] - INITIAL_STACK
+    return results
+
+def play_duplicate(hero_spec, villain_spec, num_deals, seed, engine='headless'):
+    '''
+    Play num_deals deals twice each on engine, hero in seat 0 and then in seat 1,
+    with the same cards, button seat and bot seeds. Returns hero's chip deltas as
+    a (num_deals, 2) array.
+    '''
+    orders, seeds = duplicate_deals(num_deals, seed)
+    _reset_bots(seed)
+    if engine == 'headless':
+        return _duplicate_headless(load_player(hero_spec), load_player(villain_spec), orders, seeds)
+    hero, villain = build_player(hero_spec), build_player(villain_spec)
+    kind = Player if engine == 'diy' else BasePokerPlayer
+    if not (isinstance(hero, kind) and isinstance(villain, kind)):
+        raise TypeError(f"the {engine} engine needs {kind.__name__} players")
+    runner = _duplicate_diy if engine == 'diy' else _duplicate_ppe
+    return runner(hero, villain, orders, seeds)
+
+def duplicate_check(num_deals=500, seed=0, checks=DUPLICATE_CHECKS):
+    '''
+    Play every (engine, hero, villain) of checks in duplicate and return
+    (engine, hero, villain, paired_summary) for each, to see how much pairing
+    the seats cuts the variance for that pair of bots.
+    '''
+    return [(engine, hero, villain,
+             paired_summary(*_duplicate_stats(play_duplicate(hero, villain, num_deals, seed, engine))))
+            for engine, hero, villain in checks]
+
+def _shard_stats(deltas):
+    return [len(deltas), int(deltas.sum()), int(np.dot(deltas, deltas))]
+
+def _duplicate_stats(results):
+    # per deal: hero's total over both seatings; hand_sq keeps the unpaired variance
+    paired = results.sum(axis=1)
+    return _shard_stats(paired) + [int((results * results).sum())]
+
+def _run_shard(args):
+    index, hero_spec, villain_spec, size, seed, engine = args
+    if engine is None:
+        return index, _shard_stats(play_shard(hero_spec, villain_spec, size, seed))
+    return index, _duplicate_stats(play_duplicate(hero_spec, villain_spec, size, seed, engine))
+
+def _variance(n, total, total_sq):
+    return max(total_sq - total * total / n, 0.0) / (n - 1) if n > 1 else 0.0
+
+def summarize(n, total, total_sq, big_blind=BIG_BLIND, hands_per_unit=1):
+    '''
+    bb/100 winrate, its standard error and 95% interval from chip sums over n
+    units of hands_per_unit hands each.
+    '''
+    scale = 100 / big_blind / hands_per_unit
+    bb100 = total / n * scale
+    se = np.sqrt(_variance(n, total, total_sq) / n) * scale
+    return {'hands': n * hands_per_unit, 'bb100': bb100, 'se': se, 'ci95': [bb100 - Z_95 * se, bb100 + Z_95 * se]}
+
+def paired_summary(n, total, total_sq, hand_sq, big_blind=BIG_BLIND):
+    '''
+    summarize over n duplicate deals, plus the paired difference (hero's chips per
+    deal over both seatings), its variance, the variance the same two hands would
+    have if unpaired and the ratio of the two.
+    '''
+    result = summarize(n, total, total_sq, big_blind, hands_per_unit=2)
+    paired_var = _variance(n, total, total_sq)
+    unpaired_var = 2 * _variance(2 * n, total, hand_sq)
+    result.update({
+        'deals': n,
+        'paired_diff': total / n,
+        'paired_var': paired_var,
+        'unpaired_var': unpaired_var,
+        'variance_reduction': unpaired_var / paired_var if paired_var > 0 else None,
+    })
+    return result
+
+def evaluate(hero_spec, villain_spec, num_hands, shard_hands=SHARD_HANDS, processes=None,
+             seed=0, target_se=None, out_path=None, duplicate=False, engine='headless'):
+    '''
+    Play up to num_hands hands of hero vs villain across a process pool. With
+    target_se, stop at the first prefix of shards whose bb/100 standard error is at
+    most target_se. With duplicate, the hands are num_hands // 2 duplicate deals
+    played on engine. Returns the summary dict (also written to out_path as JSON).
+    '''
+    if engine not in ENGINES:
+        raise ValueError(f"engine must be one of {ENGINES}, got {engine!r}")
+    if engine != 'headless' and not duplicate:
+        raise ValueError("the diy and ppe engines only run duplicate matches")
+    # duplicate shards count deals of two hands each
+    per_unit = 2 if duplicate else 1
+    num_units = num_hands // per_unit
+    shard_units = max(shard_hands // per_unit, 1)
+    num_shards = -(-num_units // shard_units)
+    seeds = shard_seeds(seed, num_shards)
+    sizes = [min(shard_units, num_units - i * shard_units) for i in range(num_shards)]
+    tasks = [(i, hero_spec, villain_spec, sizes[i], seeds[i], engine if duplicate else None)
+             for i in range(num_shards)]
+    summary = paired_summary if duplicate else summarize
+    shards = [None] * num_shards
+    totals = [0] * (4 if duplicate else 3)
+    next_shard = 0
+    start = time.perf_counter()
+    with mp.Pool(processes) as pool:
+        for index, stats in pool.imap_unordered(_run_shard, tasks):
+            shards[index] = stats
+            # aggregate in shard order so early stopping does not depend on timing
+            while next_shard < num_shards and shards[next_shard] is not None:
+                totals = [a + b for a, b in zip(totals, shards[next_shard])]
+                next_shard += 1
+            if target_se is not None and totals[0] > 1 and summary(*totals)['se'] <= target_se:
+                pool.terminate()
+                break
+    result = summary(*totals)
+    result.update({
+        'hero': hero_spec,
+        'villain': villain_spec,
+        'seed': seed,
+        'shard_hands': shard_units * per_unit,
+        'shards': shards[:next_shard],
+        'seconds': round(time.perf_counter() - start, 2),
+    })
+    if duplicate:
+        result['engine'] = engine
+    if out_path is not None:
+        with open(out_path, 'w') as f:
+            json.dump(result, f, separators=(',', ':'))
+    return result
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('hero', nargs='?')
+    parser.add_argument('villain', nargs='?')
+    parser.add_argument('--hands', type=int, default=20000)
+    parser.add_argument('--shard-hands', type=int, default=SHARD_HANDS)
+    parser.add_argument('--processes', type=int, default=None)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--target-se', type=float, default=None, help="stop once the bb/100 standard error is this small")
+    parser.add_argument('--duplicate', action='store_true', help="replay every deal with the seats swapped")
+    parser.add_argument('--engine', choices=ENGINES, default='headless', help="table used for duplicate matches")
+    parser.add_argument('--out', default='match_results.json')
+    parser.add_argument('--check', action='store_true',
+                        help="measure the duplicate variance reduction of DUPLICATE_CHECKS over --hands // 2 deals")
+    args = parser.parse_args()
+    if args.check:
+        for engine, hero, villain, res in duplicate_check(args.hands // 2, args.seed):
+            ratio = res['variance_reduction']
+            print(f"{engine:8} {hero} vs {villain}: paired variance {res['paired_var']:.0f} vs "
+                  f"{res['unpaired_var']:.0f} unpaired, " + (f"{ratio:.1f}x lower" if ratio else "fully cancelled"))
+        raise SystemExit
+    if args.villain is None:
+        parser.error("hero and villain are required unless --check is given")
+    for spec in (args.hero, args.villain):
+        try:
+            parse_spec(spec)
+        except ValueError as e:
+            parser.error(str(e))
+    res = evaluate(args.hero, args.villain, args.hands, args.shard_hands, args.processes,
+                   args.seed, args.target_se, args.out, args.duplicate, args.engine)
+    lo, hi = res['ci95']
+    print(f"{res['hero']} vs {res['villain']}: {res['bb100']:+.1f} bb/100 +/- {res['se']:.1f} "
+          f"(95% CI {lo:+.1f} .. {hi:+.1f}) over {res['hands']} hands in {res['seconds']}s")
+    if args.duplicate:
+        ratio = res['variance_reduction']
+        print(f"paired difference {res['paired_diff']:+.1f} chips/deal, variance {res['paired_var']:.0f} "
+              f"vs {res['unpaired_var']:.0f} unpaired" + (f" ({ratio:.1f}x lower)" if ratio else ""))
@@ -0,0 +1,32 @@
+"""
+Keras side of the compact decision encoding in features.py: the model takes
+int8 card indices and float features and expands the cards in its graph.
+"""
+import tensorflow as tf
+
+import features
+
+@tf.keras.utils.register_keras_serializable(package='poker')
+class CardExpansion(tf.keras.layers.Layer):
+    '''
+    (cards (N, 7) int8, feats (N, 4)) -> the (N, 108) rows of features.expand.
+    '''
+
+    def call(self, inputs):
+        cards, feats = inputs
+        one_hot = tf.one_hot(tf.cast(cards, tf.int32), features.NUM_CARDS)  # -1 gives a zero row
+        hole = tf.reduce_sum(one_hot[:, :features.HOLE_SLOTS], axis=1)
+        board = tf.reduce_sum(one_hot[:, features.HOLE_SLOTS:], axis=1)
+        return tf.concat([hole, board, tf.cast(feats, tf.float32)], axis=1)
+
+def build_model(hidden=(256, 256)):
+    '''
+    The fold/call/raise network from simple_model.py on the compact inputs.
+    '''
+    cards = tf.keras.Input(shape=(features.CARD_SLOTS,), dtype='int8', name='cards')
+    feats = tf.keras.Input(shape=(features.NUM_FEATS,), name='feats')
+    x = CardExpansion(name='expand')([cards, feats])
+    for units in hidden:
+        x = tf.keras.layers.Dense(units, activation='relu')(x)
+    probs = tf.keras.layers.Dense(3, activation='softmax')(x)   # 3 actions: fold/call/raise
+    return tf.keras.Model([cards, feats], probs)
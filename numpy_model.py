@@ -0,0 +1,182 @@
+"""
+TensorFlow-free inference for the fold/call/raise policy network.
+
+export() pulls the Dense kernels and biases (and activations) out of a Keras
+.h5 file with h5py and saves them as a small .npz; NumpyModel runs the forward
+pass in NumPy with Keras' predict contract (a batch in, a (N, 3) float32 array
+of action probabilities out). It loads either file, so a player needs neither
+TensorFlow nor a conversion step, but the .npz loads fastest. Models built on
+the compact encoding (model_layers.build_model) are supported too: their
+CardExpansion layer becomes features.expand.
+
+    python numpy_model.py [model.h5] [model.npz]
+"""
+import json
+import os
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+import features
+
+ACTIVATIONS = {
+    'linear': lambda x: x,
+    'relu': lambda x: np.maximum(x, 0, out=x),
+    'tanh': lambda x: np.tanh(x, out=x),
+    'sigmoid': lambda x: np.divide(1, 1 + np.exp(-x), out=x),
+    'softmax': lambda x: softmax(x),
+}
+
+def softmax(x):
+    x = x - x.max(axis=1, keepdims=True)
+    np.exp(x, out=x)
+    x /= x.sum(axis=1, keepdims=True)
+    return x
+
+def _find(group, prefix):
+    # Keras 2 stores dense/dense/kernel:0, Keras 3 dense/sequential/dense/kernel
+    found = []
+    group.visititems(lambda name, obj: found.append(obj) if name.split('/')[-1].startswith(prefix) else None)
+    if len(found) != 1:
+        raise ValueError(f"expected one {prefix} under {group.name}, found {len(found)}")
+    return np.asarray(found[0], dtype=np.float32)
+
+def read_h5(path):
+    '''
+    (layers, compact) of a Keras .h5 model: layers is a list of (kernel, bias,
+    activation) for its Dense layers in order, compact whether it takes the
+    features.py (cards, feats) inputs. Raises ValueError for other layer types.
+    '''
+    import h5py
+    with h5py.File(path, 'r') as f:
+        config = json.loads(f.attrs['model_config'])
+        layers, compact = [], False
+        for layer in config['config']['layers']:
+            kind, name = layer['class_name'], layer['config']['name']
+            if kind == 'InputLayer':
+                continue
+            if kind == 'CardExpansion' or kind.endswith('>CardExpansion'):
+                compact = True
+                continue
+            if kind != 'Dense':
+                raise ValueError(f"layer {name}: {kind} is not supported")
+            activation = layer['config'].get('activation', 'linear')
+            if activation not in ACTIVATIONS:
+                raise ValueError(f"layer {name}: activation {activation} is not supported")
+            group = f['model_weights'][name]
+            bias = _find(group, 'bias') if layer['config'].get('use_bias', True) else None
+            layers.append((_find(group, 'kernel'), bias, activation))
+    return layers, compact
+
+def export(h5_path, npz_path):
+    '''
+    Write the Dense weights of a Keras .h5 model to npz_path.
+    '''
+    layers, compact = read_h5(h5_path)
+    arrays = {'activations': np.array([a for _, _, a in layers]), 'compact': np.array(compact)}
+    for i, (kernel, bias, _) in enumerate(layers):
+        arrays[f'kernel{i}'] = kernel
+        if bias is not None:
+            arrays[f'bias{i}'] = bias
+    np.savez(npz_path, **arrays)
+
+class NumpyModel:
+    '''
+    A chain of Dense layers evaluated in float32 NumPy.
+    '''
+
+    def __init__(self, layers, compact=False):
+        self.layers = layers
+        self.compact = compact
+        # features.model_inputs tells the two input layouts apart by this
+        self.inputs = [None, None] if compact else [None]
+
+    @classmethod
+    def load(cls, path):
+        if path.endswith('.h5'):
+            return cls(*read_h5(path))
+        with np.load(path) as f:
+            layers = [(f[f'kernel{i}'], f[f'bias{i}'] if f'bias{i}' in f else None, str(a))
+                      for i, a in enumerate(f['activations'])]
+            return cls(layers, bool(f['compact']))
+
+    def predict(self, x, verbose=0, batch_size=None):
+        if self.compact:
+            x = features.expand(*x)
+        x = np.asarray(x, dtype=np.float32)
+        for kernel, bias, activation in self.layers:
+            x = x @ kernel
+            if bias is not None:
+                x += bias
+            x = ACTIVATIONS[activation](x)
+        return x
+
+    __call__ = predict
+
+def load_model(path='poker_bot.h5'):
+    '''
+    NumpyModel for a .h5 or .npz path, preferring an exported .npz next to a .h5.
+    '''
+    npz = os.path.splitext(path)[0] + '.npz'
+    return NumpyModel.load(npz if os.path.exists(npz) else path)
+
+# -------------------------------------------------------------------------
+# Benchmark
+# -------------------------------------------------------------------------
+def _cold_start(code):
+    start = time.perf_counter()
+    subprocess.run([sys.executable, '-c', code], check=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+    return time.perf_counter() - start
+
+if __name__ == '__main__':
+    h5_path = sys.argv[1] if len(sys.argv) > 1 else 'poker_bot.h5'
+    npz_path = sys.argv[2] if len(sys.argv) > 2 else os.path.splitext(h5_path)[0] + '.npz'
+    export(h5_path, npz_path)
+    print(f"exported {h5_path} ({os.path.getsize(h5_path):,} bytes) -> "
+          f"{npz_path} ({os.path.getsize(npz_path):,} bytes)")
+
+    model = NumpyModel.load(npz_path)
+    rng = np.random.default_rng(0)
+    cards = np.stack([rng.permutation(52)[:7] for _ in range(1024)]).astype(np.int8)
+    board_len = rng.choice([0, 3, 4, 5], 1024)
+    cards[:, 2:][np.arange(5) >= board_len[:, None]] = -1
+    feats = rng.uniform(0, 1000, (1024, 4)).astype(np.float32)
+    feats[:, 3] = (cards[:, 2:] >= 0).sum(axis=1)
+    x = features.expand(cards, feats)
+
+    runs = 2000
+    start = time.perf_counter()
+    for i in range(runs):
+        model.predict(x[i % 1024][None])
+    single = (time.perf_counter() - start) / runs
+    start = time.perf_counter()
+    for i in range(runs):
+        model.predict(features.model_inputs(model, *features.encode_batch(
+            cards[i % 1024, None, :2], cards[i % 1024, None, 2:], feats[i % 1024, 0],
+            feats[i % 1024, 1], feats[i % 1024, 2])))
+    decision = (time.perf_counter() - start) / runs
+    start = time.perf_counter()
+    for _ in range(20):
+        model.predict(x)
+    batched = 20 * len(x) / (time.perf_counter() - start)
+    print(f"NumPy: {single * 1e6:.0f} us per single-row predict, {decision * 1e6:.0f} us per "
+          f"encoded decision, {batched:,.0f} rows/s batched")
+
+    cold = _cold_start(f"import numpy_model; numpy_model.NumpyModel.load({npz_path!r})")
+    print(f"cold start (import + load .npz): {cold:.2f}s")
+    try:
+        import tensorflow as tf
+    except ImportError:
+        print("TensorFlow not installed; skipping the Keras comparison")
+    else:
+        keras_model = tf.keras.models.load_model(h5_path)
+        reference = keras_model.predict(x, verbose=0)
+        print(f"max |NumPy - Keras| = {np.abs(model.predict(x) - reference).max():.2e}")
+        start = time.perf_counter()
+        for i in range(100):
+            keras_model.predict(x[i][None], verbose=0)
+        print(f"Keras: {(time.perf_counter() - start) / 100 * 1e6:.0f} us per single-row predict")
+        cold = _cold_start(f"import tensorflow as tf; tf.keras.models.load_model({h5_path!r})")
+        print(f"cold start (import TensorFlow + load .h5): {cold:.2f}s")
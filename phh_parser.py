@@ -0,0 +1,248 @@
+"""
+Streaming parser for PHHS hand-history files.
+
+A .phhs file is a sequence of sections headed by [n], each holding `key = value`
+lines in PHH's TOML subset: quoted strings, integers, floats, true/false and
+(nested) arrays. Files are read line by line and sections are yielded one at a
+time, so memory holds a single section. Values are scanned by a small regex
+tokenizer instead of ast.literal_eval, and only the keys a caller asks for are
+parsed at all. parse_directory spreads the files of a directory over a process
+pool and streams their sections back in file order with a bounded number of
+files in flight.
+
+    python phh_parser.py /path/to/handhq/dir
+"""
+import ast
+from collections import deque
+import multiprocessing as mp
+import os
+import re
+import sys
+import tempfile
+import time
+
+# key in the file -> key in the pruned section used for training
+PRUNED_KEYS = {
+    'blinds_or_straddles': 'blinds',
+    'antes': 'antes',
+    'starting_stacks': 'starting_stacks',
+    'actions': 'actions',
+    'seats': 'seats',
+}
+
+_HEADER = re.compile(r'\[(\d+)\]\s*$')
+_TOKEN = re.compile(r'''\s*(?:
+      '(?P<sq>(?:[^'\\]|\\.)*)'
+    | "(?P<dq>(?:[^"\\]|\\.)*)"
+    | (?P<num>[-+]?\d[\d_]*(?:\.\d[\d_]*)?(?:[eE][-+]?\d+)?)(?![\w.:-])
+    | (?P<bool>true|false)\b
+    | (?P<open>\[)
+    | (?P<close>\])
+    | (?P<comma>,)
+    | (?P<end>\#.*|$)
+    )''', re.X)
+# flat arrays of plain strings or numbers (actions, stacks, blinds, seats) skip the token loop
+_NUM = r'[-+]?\d+(?:\.\d+)?'
+_FLAT_STRINGS = re.compile(r"\s*\[\s*(?:'[^'\\\n]*'\s*,\s*)*(?:'[^'\\\n]*'\s*)?\]\s*$")
+_FLAT_NUMBERS = re.compile(rf"\s*\[\s*(?:{_NUM}\s*,\s*)*(?:{_NUM}\s*)?\]\s*$")
+_STRING_ITEM = re.compile(r"'([^']*)'")
+_NUMBER_ITEM = re.compile(_NUM)
+_ESCAPE = re.compile(r'\\(u[0-9a-fA-F]{4}|.)')
+_ESCAPES = {'n': '\n', 't': '\t', 'r': '\r', 'b': '\b', 'f': '\f'}
+
+def _unescape(s):
+    if '\\' not in s:
+        return s
+    return _ESCAPE.sub(lambda m: chr(int(m.group(1)[1:], 16)) if len(m.group(1)) == 5
+                       else _ESCAPES.get(m.group(1), m.group(1)), s)
+
+def _number(text):
+    text = text.replace('_', '')
+    if '.' in text or 'e' in text or 'E' in text:
+        return float(text)
+    return int(text)
+
+def parse_value(text):
+    '''
+    Parse one PHH value: 'str' / "str" (with backslash escapes), integers, floats,
+    true / false and arrays of those, optionally followed by a # comment.
+    Raises ValueError on anything else.
+    '''
+    if _FLAT_STRINGS.match(text):
+        return _STRING_ITEM.findall(text)
+    if _FLAT_NUMBERS.match(text):
+        return [float(x) if '.' in x else int(x) for x in _NUMBER_ITEM.findall(text)]
+    stack = [[]]
+    pos = 0
+    need_comma = False  # a value was just closed inside an array
+    while True:
+        m = _TOKEN.match(text, pos)
+        if m is None:
+            raise ValueError(f"bad PHH value at column {pos}: {text!r}")
+        pos = m.end()
+        kind = m.lastgroup
+        if kind == 'end':
+            break
+        if kind == 'comma':
+            if len(stack) == 1 or not need_comma:
+                raise ValueError(f"unexpected ',' in {text!r}")
+            need_comma = False
+            continue
+        if kind == 'close':
+            if len(stack) == 1:
+                raise ValueError(f"unbalanced ']' in {text!r}")
+            value = stack.pop()
+        elif need_comma:
+            raise ValueError(f"missing ',' in {text!r}")
+        elif kind == 'open':
+            stack.append([])
+            continue
+        elif kind == 'sq' or kind == 'dq':
+            value = _unescape(m.group(kind))
+        elif kind == 'num':
+            value = _number(m.group('num'))
+        else:
+            value = m.group('bool') == 'true'
+        stack[-1].append(value)
+        need_comma = len(stack) > 1
+    if len(stack) != 1 or len(stack[0]) != 1:
+        raise ValueError(f"expected exactly one value in {text!r}")
+    return stack[0][0]
+
+def iter_raw_sections(path, keys=None):
+    '''
+    Yield (section number, {key: value}) for each [n] section of a .phhs file,
+    reading it line by line. With keys, other keys are skipped without parsing.
+    Values that are not valid PHH (e.g. bare words) are kept as stripped strings.
+    '''
+    number, sec = None, None
+    with open(path, 'r') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            if line[0] == '[':
+                header = _HEADER.match(line)
+                if header:
+                    if sec is not None:
+                        yield number, sec
+                    number, sec = int(header.group(1)), {}
+                    continue
+            if sec is None:
+                continue
+            key, sep, val = line.partition('=')
+            if not sep:
+                continue
+            key = key.strip()
+            if keys is not None and key not in keys:
+                continue
+            try:
+                sec[key] = parse_value(val)
+            except ValueError:
+                sec[key] = val.strip().strip("'\"")
+    if sec is not None:
+        yield number, sec
+
+def prune_section(sec):
+    return {PRUNED_KEYS[k]: sec[k] for k in PRUNED_KEYS}
+
+def iter_sections(path):
+    '''
+    Yield the pruned sections (blinds, antes, starting_stacks, actions, seats) of
+    a .phhs file one at a time.
+    '''
+    for _, sec in iter_raw_sections(path, PRUNED_KEYS):
+        yield prune_section(sec)
+
+def _parse_file(path):
+    return list(iter_sections(path))
+
+def list_files(directory, suffix='.phhs'):
+    return sorted(os.path.join(directory, fn) for fn in os.listdir(directory) if fn.endswith(suffix))
+
+def parse_directory(directory, processes=None, max_pending=None, suffix='.phhs'):
+    '''
+    Pruned sections of every file in directory (sorted by name), parsed by a
+    process pool. At most max_pending files (default two per process) are parsed
+    or waiting to be consumed at any time, so memory stays bounded however large
+    the corpus. With processes=1 the files are parsed in this process.
+    '''
+    paths = list_files(directory, suffix)
+    processes = processes or os.cpu_count() or 1
+    if processes == 1:
+        for path in paths:
+            yield from iter_sections(path)
+        return
+    max_pending = max_pending or 2 * processes
+    with mp.Pool(processes) as pool:
+        pending = deque()
+        for path in paths:
+            pending.append(pool.apply_async(_parse_file, (path,)))
+            if len(pending) >= max_pending:
+                yield from pending.popleft().get()
+        while pending:
+            yield from pending.popleft().get()
+
+# -------------------------------------------------------------------------
+# Benchmark
+# -------------------------------------------------------------------------
+def _literal_eval_sections(path):
+    # the original whole-file parser, kept as the benchmark reference
+    text = open(path, 'r').read()
+    text = text.replace('false', 'False').replace('true', 'True')
+    parts = re.split(r'(?m)^\[\d+\]\s*$', text)
+    headers = re.findall(r'(?m)^\[(\d+)\]\s*$', text)
+    sections = []
+    for idx, body in zip(headers, parts[1:]):
+        sec = {}
+        for line in body.splitlines():
+            line = line.strip()
+            if not line or '=' not in line:
+                continue
+            key, val_str = map(str.strip, line.split('=', 1))
+            try:
+                val = ast.literal_eval(val_str)
+            except Exception:
+                val = val_str.strip("'\"")
+            sec[key] = val
+        sections.append(prune_section(sec))
+    return sections
+
+def write_sample(path, num_hands, seed=0):
+    '''
+    Write a synthetic six-max .phhs file in the handhq layout, for benchmarking.
+    '''
+    import random
+    rng = random.Random(seed)
+    with open(path, 'w') as f:
+        for hand in range(1, num_hands + 1):
+            actions = [f'd dh p{s} ????' for s in range(1, 7)]
+            for street, cards in enumerate(('', '7s9hAc', 'Td', '2c')):
+                if street:
+                    actions.append(f'd db {cards}')
+                for s in rng.sample(range(1, 7), 3):
+                    actions.append(rng.choice([f'p{s} f', f'p{s} cc', f'p{s} cbr {rng.randint(1, 40) / 2}']))
+            f.write(f"[{hand}]\nvariant = 'NT'\nante_trimming_status = true\nantes = [0, 0, 0, 0, 0, 0]\n"
+                    f"blinds_or_straddles = [0.25, 0.5, 0, 0, 0, 0]\nmin_bet = 0.5\n"
+                    f"starting_stacks = {[round(rng.uniform(20, 100), 2) for _ in range(6)]}\n"
+                    f"actions = {actions}\nvenue = 'Party Poker'\nhand = {hand}\n"
+                    f"players = {['player_true_%d' % rng.randint(0, 10 ** 6) for _ in range(6)]}\n"
+                    f"seats = [1, 2, 3, 4, 5, 6]\nday = 1\nmonth = 7\nyear = 2009\n\n")
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1:
+        directory = sys.argv[1]
+    else:
+        directory = tempfile.mkdtemp()
+        for i in range(8):
+            write_sample(os.path.join(directory, f'sample{i}.phhs'), 2000, seed=i)
+    paths = list_files(directory)
+    start = time.perf_counter()
+    old = sum(len(_literal_eval_sections(p)) for p in paths)
+    old_rate = old / (time.perf_counter() - start)
+    for processes in (1, os.cpu_count() or 1):
+        start = time.perf_counter()
+        count = sum(1 for _ in parse_directory(directory, processes))
+        rate = count / (time.perf_counter() - start)
+        print(f"{processes} process(es): {count} sections, {rate:,.0f} sections/s "
+              f"vs {old_rate:,.0f} with literal_eval ({rate / old_rate:.1f}x)")
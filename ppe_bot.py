@@ -2,9 +2,12 @@
 Minimal six-max no-limit Hold'em simulator and baseline bot using only Treys for hand evaluation.
 """
 import random
-from treys import Deck, Evaluator, Card
+from treys import Card
 from pypokerengine.players import BasePokerPlayer
 from pypokerengine.api.game import setup_config, start_poker
+import equity_cache
+import equity_pool
+import preflop_table
 
 # Game constants
 SMALL_BLIND = 5
@@ -71,6 +74,13 @@ class RampagePlayer(BasePokerPlayer):
         pass
 
 class MCPlayer(BasePokerPlayer):  # Do not forget to make parent class as "BasePokerPlayer"
+    def __init__(self, equity_mode='serial', equity_sampler='iid'):
+        super().__init__()
+        # 'parallel' splits equity sims across the shared equity_pool worker processes
+        self.equity_pool = equity_pool.pool_for_mode(equity_mode)
+        # one of equity.SAMPLERS
+        self.equity_sampler = equity_sampler
+
     #  we define the logic to make an action through this method. (so this method would be the core of your AI)
     def declare_action(self, valid_actions, hole_card, round_state):
         # valid_actions format => [raise_action_info, call_action_info, fold_action_info]
@@ -100,10 +110,16 @@ class MCPlayer(BasePokerPlayer):  # Do not forget to make parent class as "BaseP
         Card.print_pretty_cards(hole)
         Card.print_pretty_cards(board)
     
-        eq = self.estimate_equity(hole, board)
+        pot_odds = to_call / pot
+        # ev_raise >= ev_call flips at 50% equity
+        thresholds = [0.5]
+        if to_call == BIG_BLIND:
+            thresholds.append(0.40)
+        elif to_call > BIG_BLIND:
+            thresholds.append(pot_odds*0.67)
+        eq = self.estimate_equity(hole, board, thresholds)
         ev_fold = 0
 
-        pot_odds = to_call / pot
         if to_call == BIG_BLIND and eq < 0.40:
                 print(f"open folding due  to pot odds: {eq:.2f} chance of winning with {pot_odds:.2f} odds")
                 return 'fold', 0
@@ -119,7 +135,7 @@ class MCPlayer(BasePokerPlayer):  # Do not forget to make parent class as "BaseP
         raise_amt = round(min(stack_size, to_call + X))
         ev_raise = winning_odds * (pot + raise_amt) - losing_odds * raise_amt
 
-        print(f"  equity = {eq:.2f}, ev_call = {ev_call:.2f}, to_call = {to_call}, ev_raise = {ev_raise:.2f}, raise_amt = {raise_amt}")
+        print(f"  equity = {eq:.2f} ({self.last_sims} sims), ev_call = {ev_call:.2f}, to_call = {to_call}, ev_raise = {ev_raise:.2f}, raise_amt = {raise_amt}")
 
         if ev_raise >= ev_call and ev_raise >= ev_fold:
             return 'raise', raise_amt
@@ -127,29 +143,17 @@ class MCPlayer(BasePokerPlayer):  # Do not forget to make parent class as "BaseP
             return 'call', to_call
         return 'fold', 0
 
-    def estimate_equity(self, hole, board):
-        wins = ties = 0
-        for _ in range(MC_SIMS):
-            deck = Deck()
-            deck.shuffle()
-            # remove known cards
-            for c in hole + board:
-                deck.cards.remove(c)
-            # deal opponents
-            opps = [deck.draw(2) for _ in range(NUM_OPPONENTS)]
-            # deal remaining community
-            evaluator = Evaluator()
-            future = deck.draw(5 - len(board))
-            future_strs = [Card.int_to_str(c) for c in future]
-            full_board = board + future
-            my_score = evaluator.evaluate(hole, full_board)
-            opp_scores = [evaluator.evaluate(h, full_board) for h in opps]
-            best_opp = min(opp_scores)
-            if my_score < best_opp:
-                wins += 1
-            elif my_score == best_opp:
-                ties += 1
-        return (wins + ties / 2) / MC_SIMS
+    def estimate_equity(self, hole, board, thresholds=None):
+        # thresholds: equities the decision hinges on; sampling stops once they are cleared
+        self.last_sims = 0
+        if not board:
+            eq = preflop_table.preflop_equity(hole, NUM_OPPONENTS)
+            if eq is not None:
+                return eq
+        res = equity_cache.cached_equity(hole, board, NUM_OPPONENTS, MC_SIMS, thresholds, self.equity_pool,
+                                         sampler=self.equity_sampler)
+        self.last_sims = res.num_sims
+        return res.equity
 
 def to_treys(cards):
     ret = []
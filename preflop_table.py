@@ -0,0 +1,84 @@
+"""
+Precomputed preflop equity for the 169 starting-hand classes against 1-5 random opponents.
+
+The table is built offline with `python preflop_table.py` and memory-mapped at import,
+so preflop equity is a single array lookup instead of a Monte Carlo run.
+"""
+import os
+import sys
+import time
+
+import numpy as np
+from tqdm import tqdm
+
+import equity
+
+TABLE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'preflop_equity.npy')
+MAX_OPPONENTS = 5
+NUM_CLASSES = 169
+BUILD_SIMS = 200000
+BUILD_BATCH = 20000
+
+def hand_class(hole):
+    """
+    Strategic class of two card indices on a 13x13 grid: pairs on the diagonal,
+    suited hands at [high, low] and offsuit hands at [low, high].
+    """
+    r1, r2 = hole[0] >> 2, hole[1] >> 2
+    hi, lo = max(r1, r2), min(r1, r2)
+    if (hole[0] & 3) == (hole[1] & 3):
+        return hi * 13 + lo
+    return lo * 13 + hi
+
+def class_name(cls):
+    a, b = divmod(cls, 13)
+    if a == b:
+        return equity.RANKS[a] * 2
+    if a > b:
+        return equity.RANKS[a] + equity.RANKS[b] + 's'
+    return equity.RANKS[b] + equity.RANKS[a] + 'o'
+
+def representative(cls):
+    # spade/heart cards; suited classes use two spades
+    a, b = divmod(cls, 13)
+    if a > b:
+        return [a * 4 + 3, b * 4 + 3]
+    return [a * 4 + 3, b * 4]
+
+def load_table(path=TABLE_PATH):
+    if not os.path.exists(path):
+        return None
+    return np.load(path, mmap_mode='r')
+
+_TABLE = load_table()
+
+def preflop_equity(hole, num_opponents=1):
+    """
+    Table equity of treys hole cards, or None if the table has not been built
+    or does not cover num_opponents.
+    """
+    if _TABLE is None or not 1 <= num_opponents <= MAX_OPPONENTS:
+        return None
+    return float(_TABLE[num_opponents - 1, hand_class(equity.treys_to_index(hole))])
+
+def build_table(path=TABLE_PATH, num_sims=BUILD_SIMS, seed=0):
+    rng = np.random.default_rng(seed)
+    table = np.zeros((MAX_OPPONENTS, NUM_CLASSES), dtype=np.float32)
+    for cls in tqdm(range(NUM_CLASSES), desc="Building preflop table"):
+        hole = representative(cls)
+        for n in range(1, MAX_OPPONENTS + 1):
+            total = 0.0
+            for start in range(0, num_sims, BUILD_BATCH):
+                batch = min(BUILD_BATCH, num_sims - start)
+                total += equity.simulate(hole, [], n, batch, rng).sum()
+            table[n - 1, cls] = total / num_sims
+    np.save(path, table)
+    return table
+
+if __name__ == '__main__':
+    num_sims = int(sys.argv[1]) if len(sys.argv) > 1 else BUILD_SIMS
+    start = time.perf_counter()
+    table = build_table(num_sims=num_sims)
+    print(f"Built {table.shape} table with {num_sims} sims per entry in {time.perf_counter() - start:.0f}s")
+    for cls in (hand_class([51, 50]), hand_class([51, 47]), hand_class([51, 44]), hand_class([0, 23])):
+        print(class_name(cls), ' '.join(f"{eq:.3f}" for eq in table[:, cls]))
@@ -0,0 +1,243 @@
+"""
+Post-training int8 quantization of the fold/call/raise policy network.
+
+quantize() takes a numpy_model.NumpyModel and a calibration sample of encoded
+decisions (the 108-float rows of features.expand). Each Dense layer gets int8
+weights with one scale per output unit. The first layer's one-hot card columns
+get one static scale per column, taken from the largest value that column
+reaches on the sample and folded into the weights before they are rounded. Its
+chip-count and board-size columns (features.NUM_FEATS) stay float32 with
+float32 weights: they are unbounded, so any calibrated range is exceeded by some
+deployment and clipped, and there are only four of them. The hidden layers'
+inputs are quantized with one scale per row, from the row's largest value, for
+the same reason: PyPokerEngine pots and stacks run an order of magnitude past
+the handhq corpus, and so do the activations they drive.
+
+QuantizedModel stores the int8 weights, the scales and those few float rows.
+Its predict quantizes each layer's input to int8 and accumulates the int8
+products exactly, because integers below 2**24 are exact in float32 and the
+float BLAS can do the sums; the float32 copies of the kernels it multiplies by
+are made once per process, on the first predict, while the model is stored and
+shipped as int8. It then rescales, adds the float columns' products and the
+float bias and applies the activation. It has the same predict contract as
+NumpyModel, so ModelPlayer and InferenceBroker take it as is.
+
+The demo calibrates on training decisions (training_sample) together with
+deployment_sample, the rows ModelPlayer feeds the model while it plays, and
+reports agreement with the float model on held-out rows of each.
+
+    python quantized_model.py [model.h5] [encoded_cache_dir]
+"""
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+import features
+import numpy_model
+
+QMAX = 127
+
+def training_sample(cache_dir=None, num_rows=20000, seed=0):
+    '''
+    Up to num_rows encoded training decisions (features.expand rows): read from
+    the dataset_cache shards in cache_dir, or encoded from a synthetic
+    phh_parser.write_sample corpus when there is no cache.
+    '''
+    import dataset_cache
+    shards = dataset_cache.open_shards(cache_dir) if cache_dir else []
+    if not dataset_cache.num_rows(shards):
+        import tempfile
+        import phh_parser
+        tmp = tempfile.mkdtemp()
+        phh_parser.write_sample(os.path.join(tmp, 'calibration.phhs'), num_rows // 10 + 1, seed)
+        dataset_cache.build(tmp, os.path.join(tmp, 'cache'), processes=1)
+        shards = dataset_cache.open_shards(os.path.join(tmp, 'cache'))
+    rows, total = [], 0
+    for (cards, feats), _ in dataset_cache.iter_batches(shards, 1024, seed=seed):
+        rows.append(features.expand(cards, feats))
+        total += len(cards)
+        if total >= num_rows:
+            break
+    return np.concatenate(rows)[:num_rows]
+
+class _RowRecorder:
+    # stands in for a model and keeps every row it is asked to predict
+    def __init__(self, model):
+        self.model = model
+        self.inputs = getattr(model, 'inputs', None)
+        self.rows = []
+
+    def predict(self, x, verbose=0, batch_size=None):
+        self.rows.append(features.expand(*x) if len(self.inputs or ()) == 2 else np.asarray(x, dtype=np.float32))
+        return self.model.predict(x, verbose=0)
+
+def deployment_sample(model, num_rows=20000, seed=0):
+    '''
+    The first num_rows rows simple_model_test.ModelPlayer feeds model while it
+    plays FishPlayer on a headless.HeadlessTable with PyPokerEngine's 5/10 blinds
+    and 1000-chip stacks, as in simple_model_test's match.
+    '''
+    import headless
+    from simple_model_test import ModelPlayer, FishPlayer
+    recorder = _RowRecorder(model)
+    table = headless.HeadlessTable([headless.PPEAdapter(ModelPlayer(recorder)), headless.PPEAdapter(FishPlayer())],
+                                   seed=seed)
+    # both players draw from the global RNGs
+    random.seed(seed)
+    np.random.seed(seed)
+    rows = 0
+    while rows < num_rows:
+        before = len(recorder.rows)
+        table.play_hand()
+        table.rotate_dealer()
+        rows += sum(len(r) for r in recorder.rows[before:])
+    return np.concatenate(recorder.rows)[:num_rows]
+
+class QuantizedModel:
+    '''
+    A chain of int8 Dense layers. layers holds (qkernel int8, kernel_scale,
+    input_scale, bias, activation, float_kernel) per layer. input_scale is None
+    where each row gets its own scale. float_kernel holds the float32 rows of the
+    layer's last input columns, which are not quantized, or is None.
+    '''
+
+    def __init__(self, layers, compact=False):
+        self.layers = layers
+        self.compact = compact
+        self.inputs = [None, None] if compact else [None]
+        self._widened = None
+
+    def _widen(self):
+        # float32 copies of the int8 kernels and reciprocal input scales, built once per process
+        if self._widened is None:
+            self._widened = [(qkernel.astype(np.float32),
+                              None if input_scale is None else (1 / input_scale).astype(np.float32))
+                             for qkernel, _, input_scale, _, _, _ in self.layers]
+        return self._widened
+
+    def predict(self, x, verbose=0, batch_size=None):
+        if self.compact:
+            x = features.expand(*x)
+        x = np.asarray(x, dtype=np.float32)
+        for (wkernel, inv_scale), (_, kernel_scale, _, bias, activation, float_kernel) in zip(self._widen(),
+                                                                                               self.layers):
+            if inv_scale is None:
+                row_scale = np.abs(x).max(axis=1, keepdims=True) / QMAX
+                row_scale[row_scale == 0] = 1.0
+                qx = x / row_scale      # within +-QMAX by construction
+                np.rint(qx, out=qx)
+            else:
+                qx = x[:, :len(wkernel)] * inv_scale
+                np.rint(qx, out=qx)
+                np.clip(qx, -QMAX, QMAX, out=qx)
+            out = qx @ wkernel   # exact integer accumulation
+            out *= kernel_scale
+            if inv_scale is None:
+                out *= row_scale
+            if float_kernel is not None:
+                out += x[:, len(wkernel):] @ float_kernel
+            x = out
+            if bias is not None:
+                x += bias
+            x = numpy_model.ACTIVATIONS[activation](x)
+        return x
+
+    __call__ = predict
+
+    def nbytes(self):
+        return sum(a.nbytes for layer in self.layers for a in layer[:4] + layer[5:] if a is not None)
+
+    def save(self, path):
+        arrays = {'activations': np.array([layer[4] for layer in self.layers]), 'compact': np.array(self.compact)}
+        for i, (qkernel, kernel_scale, input_scale, bias, _, float_kernel) in enumerate(self.layers):
+            arrays[f'qkernel{i}'] = qkernel
+            arrays[f'kernel_scale{i}'] = kernel_scale
+            if input_scale is not None:
+                arrays[f'input_scale{i}'] = input_scale
+            if bias is not None:
+                arrays[f'bias{i}'] = bias
+            if float_kernel is not None:
+                arrays[f'float_kernel{i}'] = float_kernel
+        np.savez(path, **arrays)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as f:
+            optional = lambda key: f[key] if key in f else None
+            layers = [(f[f'qkernel{i}'], f[f'kernel_scale{i}'], optional(f'input_scale{i}'),
+                       optional(f'bias{i}'), str(a), optional(f'float_kernel{i}'))
+                      for i, a in enumerate(f['activations'])]
+            return cls(layers, bool(f['compact']))
+
+def quantize(model, sample, float_cols=features.NUM_FEATS):
+    '''
+    QuantizedModel of a NumpyModel, calibrated on sample (N, 108) float rows. The
+    last float_cols input columns of the first layer stay float32; the later
+    layers scale each input row on its own.
+    '''
+    x = np.asarray(sample, dtype=np.float32)
+    layers = []
+    for i, (kernel, bias, activation) in enumerate(model.layers):
+        if i == 0:
+            split = len(kernel) - float_cols
+            float_kernel = kernel[split:].astype(np.float32) if float_cols else None
+            col_max = np.abs(x[:, :split]).max(axis=0)
+            # columns the sample never moves keep the unit range of a one-hot column
+            input_scale = (np.where(col_max > 0, col_max, 1.0) / QMAX).astype(np.float32)
+            folded = kernel[:split] * input_scale[:, None]
+        else:
+            float_kernel = input_scale = None
+            folded = kernel
+        kernel_scale = (np.abs(folded).max(axis=0) / QMAX).astype(np.float32)
+        kernel_scale[kernel_scale == 0] = 1.0
+        qkernel = np.clip(np.rint(folded / kernel_scale), -QMAX, QMAX).astype(np.int8)
+        layers.append((qkernel, kernel_scale, input_scale, bias, activation, float_kernel))
+    return QuantizedModel(layers, model.compact)
+
+def compare(reference, quantized, x, eps=1e-7):
+    '''
+    (argmax agreement, mean KL(reference || quantized), max KL) over rows x.
+    '''
+    p = np.asarray(reference.predict(x), dtype=np.float64)
+    q = np.asarray(quantized.predict(x), dtype=np.float64)
+    kl = (p * (np.log(p + eps) - np.log(q + eps))).sum(axis=1)
+    return float((p.argmax(axis=1) == q.argmax(axis=1)).mean()), float(kl.mean()), float(kl.max())
+
+if __name__ == '__main__':
+    h5_path = sys.argv[1] if len(sys.argv) > 1 else 'poker_bot.h5'
+    cache_dir = sys.argv[2] if len(sys.argv) > 2 else None
+    model = numpy_model.load_model(h5_path)
+    half = 10000
+    samples = {'training': training_sample(cache_dir, 2 * half, seed=0),
+               'ModelPlayer': deployment_sample(model, 2 * half, seed=0)}
+    qmodel = quantize(model, np.concatenate([rows[:half] for rows in samples.values()]))
+    out_path = os.path.splitext(h5_path)[0] + '.int8.npz'
+    qmodel.save(out_path)
+    qmodel = QuantizedModel.load(out_path)
+    float_bytes = sum(k.nbytes + (b.nbytes if b is not None else 0) for k, b, _ in model.layers)
+    print(f"saved {out_path}: weights {qmodel.nbytes():,} bytes vs {float_bytes:,} float32")
+
+    for label, rows in samples.items():
+        held_out = rows[half:]
+        agree, kl_mean, kl_max = compare(model, qmodel, held_out)
+        print(f"{len(held_out)} held-out {label} decisions: argmax agreement {agree:.2%}, "
+              f"KL mean {kl_mean:.2e}, max {kl_max:.2e}")
+        probs = np.sort(model.predict(held_out), axis=1)
+        clear = probs[:, -1] - probs[:, -2] > 0.05
+        agree_clear, _, _ = compare(model, qmodel, held_out[clear])
+        print(f"  on the {clear.mean():.0%} with a top-two margin over 0.05: agreement {agree_clear:.2%}")
+
+    held_out = samples['training'][half:]
+    for label, m in (('float32', model), ('int8', qmodel)):
+        start = time.perf_counter()
+        for i in range(2000):
+            m.predict(held_out[i][None])
+        single = (time.perf_counter() - start) / 2000
+        start = time.perf_counter()
+        for _ in range(10):
+            m.predict(held_out[:2048])
+        batched = 10 * 2048 / (time.perf_counter() - start)
+        print(f"{label}: {single * 1e6:.0f} us per single-row predict, {batched:,.0f} rows/s batched")
@@ -1,188 +1,155 @@
 import re
-import ast
 import os
-import json
 import numpy as np
-from tqdm import tqdm 
-import tensorflow as tf
-
-RANKS = '23456789TJQKA'
-SUITS = 'hdcs'
-ALL_CARDS = [r+s for r in RANKS for s in SUITS]
-card_to_idx = {c:i for i,c in enumerate(ALL_CARDS)}
-
-def cards_to_onehot(cards):
-    vec = np.zeros(len(ALL_CARDS), dtype=np.float32)
-    for c in cards:
-        vec[card_to_idx[c]] = 1.0
-    return vec
+import features
+from phh_parser import iter_sections
 
 def encode_decision(dec):
-    # allow missing hole → zero vector
-    hole_oh = cards_to_onehot(dec.get('hole', []))
-    # board one-hot (pad missing)
-    board_cards = dec['board'] + ['']*(5-len(dec['board']))
-    board_oh = cards_to_onehot([c for c in board_cards if c])
-    # numeric features
-    feats = np.array([
-        dec['pot'],
-        dec['hero_stack'],
-        dec['opp_stack'],
-        len(dec['board']),
-    ], dtype=np.float32)
-    state = np.concatenate([hole_oh, board_oh, feats])
-    action_map = {'fold':0, 'call':1, 'raise':2}
-    label = action_map[dec['action']]
-    return state, label
+    # one decision dict as a 108-float row (features.expand of the compact encoding)
+    cards, feats = features.encode_batch(
+        [features.card_indices(dec.get('hole', []), features.HOLE_SLOTS)],   # allow missing hole
+        [features.card_indices(dec['board'], features.BOARD_SLOTS)],
+        [dec['pot']], [dec['hero_stack']], [dec['opp_stack']],
+    )
+    return features.expand(cards, feats)[0], ACTION_LABELS[dec['action']]
 
-def section_to_decisions(sec, hero_seat=1):
+ACTION_LABELS = {'fold': 0, 'call': 1, 'raise': 2}
+ACTION_NAMES = ['fold', 'call', 'raise']
+_CALL_TAGS = ('c', 'cc')
+_BET_TAGS = ('br', 'cbr')
+
+def replay_section(sec):
+    """
+    Walks the action list once and returns (board, decisions) for every seat in
+    sec['seats']: board is the section's list of board cards and each decision is
+    a (seat, board_len, pot, hero_stack, opp_stack, label, amount) tuple, where
+    the decision saw board[:board_len]. Pot, to-call (last raise) and every seat's
+    hero/opponent chip counts are tracked in the same pass with the same rules
+    and arithmetic as the old per-seat replay, and decisions are grouped seat by
+    seat in seats order, so the output matches replaying once per seat. (The one
+    exception is a player tag outside PHH's f/cc/cbr/sm: it counts as a raise for
+    every seat's to-call amount, not only the acting seat's.)
+    """
     blinds = sec['blinds']
-    antes  = sec['antes']
     stacks = sec['starting_stacks']
     seats  = sec['seats']
-    pot    = sum(antes) + sum(blinds)
-    hero_idx = seats.index(hero_seat)
-    hero_stack = stacks[hero_idx]
-    opp_stack  = sum(stacks) - hero_stack
+    pot    = sum(sec['antes']) + sum(blinds)
+    total  = sum(stacks)
+    hero_stack = {s: stacks[seats.index(s)] for s in seats}
+    opp_stack  = {s: total - hero_stack[s] for s in seats}
+    actor_seat = {f'p{s}': s for s in seats}
+    per_seat   = {s: [] for s in seats}
 
     board = []
-    decisions = []
-    # very basic to_call logic: track last_raise
     last_raise = max(blinds)
     for act in sec['actions']:
         parts = act.split()
         tag = parts[1]
-        if tag == "sm":
+        if tag == 'sm':
             continue
-
-        if tag == 'db':  # deal board
-            # e.g. parts[2] = '7s9hAc'
-            cards = re.findall(r'.{2}', parts[2])
-            board += cards
+        if tag == 'db':
+            board += re.findall(r'.{2}', parts[2])
             continue
 
-        # only record when hero acts
-        if parts[0] == f'p{hero_seat}':
+        actor = parts[0]
+        seat = actor_seat.get(actor)
+        if seat is not None:
             if tag == 'f':
-                action, amt = 'fold', 0
-            elif tag in ('c','cc'):
-                action, amt = 'call', last_raise
+                label, amt = 0, 0
+            elif tag in _CALL_TAGS:
+                label, amt = 1, last_raise
             else:  # bet/raise
-                action, amt = 'raise', int(float(parts[2]))
+                label, amt = 2, int(float(parts[2]))
                 last_raise = amt
-            decisions.append({
-                'hole': [],            # unknown in this format
-                'board': board.copy(),
-                'pot': pot,
-                'hero_stack': hero_stack,
-                'opp_stack': opp_stack,
-                'legal_actions': ['fold','call','raise'],
-                'action': action,
-                'amount': amt,
-            })
-
-        # update pot & stacks
-        if parts[0].startswith('p'):
-            actor = int(parts[0][1:])
-            if tag in ('c','cc'):
+            per_seat[seat].append((seat, len(board), pot, hero_stack[seat], opp_stack[seat], label, amt))
+
+        if actor.startswith('p'):
+            if tag in _CALL_TAGS:
                 delta = last_raise
-            elif tag in ('br','cbr'):
+            elif tag in _BET_TAGS:
                 delta = int(float(parts[2]))
                 last_raise = delta
             else:
-                delta = 0
+                continue
             pot += delta
-            if actor == hero_seat:
-                hero_stack -= delta
-            else:
-                opp_stack  -= delta
+            acting = int(actor[1:])
+            # every seat sees the chips leave either its own stack or its opponents'
+            for s in per_seat:
+                if s == acting:
+                    hero_stack[s] -= delta
+                else:
+                    opp_stack[s] -= delta
 
-    return decisions
+    return board, [d for s in seats for d in per_seat[s]]
 
-def prune_section(sec):
-    return {
-        'blinds':       sec['blinds_or_straddles'],
-        'antes':        sec['antes'],
-        'starting_stacks': sec['starting_stacks'],
-        'actions':      sec['actions'],
-        'seats':        sec['seats'],
-    }
+def section_to_decisions(sec, hero_seat=1):
+    """
+    Decision dicts for one seat, in encode_decision's format. Building a dataset
+    should use encode_section, which replays the hand once for every seat.
+    """
+    board, decisions = replay_section(sec)
+    return [{
+        'hole': [],            # unknown in this format
+        'board': board[:board_len],
+        'pot': pot,
+        'hero_stack': hero_stack,
+        'opp_stack': opp_stack,
+        'legal_actions': ['fold','call','raise'],
+        'action': ACTION_NAMES[label],
+        'amount': amt,
+    } for seat, board_len, pot, hero_stack, opp_stack, label, amt in decisions if seat == hero_seat]
+
+def encode_section(sec):
+    """
+    features.encode_batch for every seat's decisions in a section, straight from
+    one replay: returns cards (N, 7) int8, feats (N, 4) float32 and labels (N,)
+    int8. Hole cards are unknown in this format and encoded as absent.
+    """
+    board, decisions = replay_section(sec)
+    if not decisions:
+        return (np.zeros((0, features.CARD_SLOTS), dtype=np.int8),
+                np.zeros((0, features.NUM_FEATS), dtype=np.float32), np.zeros(0, dtype=np.int8))
+    _, board_len, pot, hero_stack, opp_stack, label, _ = zip(*decisions)
+    full_board = np.array(features.card_indices(board, features.BOARD_SLOTS), dtype=np.int8)
+    boards = np.where(np.arange(features.BOARD_SLOTS) < np.array(board_len)[:, None], full_board, -1)
+    cards, feats = features.encode_batch(-1, boards, pot, hero_stack, opp_stack)
+    return cards, feats, np.array(label, dtype=np.int8)
 
 def parse_config_phhs_file(path):
     """
     Reads a file with sections [1], [2], … each containing lines like
       key = value
-    where value may be a Python literal (strings, lists, numbers)
-    or JS‐style booleans (true/false).
-    Returns a list of dicts, one per section.
+    where value is a PHH literal (strings, lists, numbers, true/false).
+    Returns a list of pruned dicts, one per section; see phh_parser for the
+    streaming version.
     """
-    text = open(path, 'r').read()
-    # NEW: convert JS‐style booleans into Python
-    text = text.replace('false','False').replace('true','True')
-    # NEW: split on lines that look exactly like “[digit]”
-    parts   = re.split(r'(?m)^\[\d+\]\s*$', text)
-    headers = re.findall(r'(?m)^\[(\d+)\]\s*$', text)
-    sections = []
-    for idx, body in zip(headers, parts[1:]):
-        sec = {}
-        for line in body.splitlines():
-            line = line.strip()
-            if not line or '=' not in line:
-                continue
-            key, val_str = map(str.strip, line.split('=', 1))
-            try:
-                val = ast.literal_eval(val_str)
-            except Exception:
-                val = val_str.strip("'\"")
-            sec[key] = val
-        sections.append(prune_section(sec))
-    return sections
+    return list(iter_sections(path))
 
 if __name__ == "__main__":
     repo_dir = "/Users/dannyxu/code/phh-dataset/data/handhq/PTY-2009-07-01_2009-07-23_1000NLH_OBFU/10"
-    all_sections = []
-    for fn in tqdm(os.listdir(repo_dir), desc="Processing files"):
-        if fn.endswith('.phhs'):
-            path = os.path.join(repo_dir, fn)
-            all_sections.extend(parse_config_phhs_file(path))
-
-
-    all_decisions = []
-    for sec in tqdm(all_sections, desc="Processing sections"):
-        for hero_seat_num in sec['seats']:
-            all_decisions += section_to_decisions(sec, hero_seat=hero_seat_num)
+    import tensorflow as tf  # only training needs it; parsing and encoding run without
+    import dataset_cache
 
-    X_list, y_list = [], []
-    for dec in all_decisions:
-        x, y = encode_decision(dec)
-        X_list.append(x)
-        y_list.append(y)
+    # encoded decisions live in memory-mapped shards; only new or changed files are re-encoded
+    built, kept, removed = dataset_cache.build(repo_dir, dataset_cache.CACHE_DIR)
+    print(f"Encoded cache: {built} shards built, {kept} kept, {removed} removed")
+    shards = dataset_cache.open_shards(dataset_cache.CACHE_DIR)
+    print("Built dataset:", dataset_cache.num_rows(shards), "decisions in", len(shards), "shards")
 
-    X = np.stack(X_list)      # shape (N, D)
-    y = np.array(y_list)      # shape (N,)
+    print("1) Split into train/val by file (fixed across epochs and runs)")
+    import input_pipeline
+    train_shards, val_shards = dataset_cache.split_shards(shards, val_fraction=0.2)
 
-    print("Built dataset:", X.shape, y.shape)
-    # → now you can split and wrap in a DataLoader for training your PyTorch model
-
-    print("1) Build a tf.data.Dataset")
+    print("2) Build streaming tf.data pipelines over the memory-mapped shards")
     batch_size = 128
-    dataset = tf.data.Dataset.from_tensor_slices((X, y))
-    dataset = dataset.shuffle(buffer_size=len(X), seed=42)
-    dataset = dataset.batch(batch_size).prefetch(tf.data.AUTOTUNE)
-
-    print("2) Split into train/val")
-    total = len(X)
-    train_ds = dataset.take(int(0.8 * total / batch_size))
-    val_ds   = dataset.skip(int(0.8 * total / batch_size))
+    num_readers = os.cpu_count()   # parallel shard readers
+    train_ds = input_pipeline.make_dataset(train_shards, batch_size, shuffle=True, num_readers=num_readers)
+    val_ds   = input_pipeline.make_dataset(val_shards, batch_size, shuffle=False, num_readers=num_readers)
 
     print("3) Define a Keras model")
-    D_state = X.shape[1]
-    model = tf.keras.Sequential([
-        tf.keras.Input(shape=(D_state,)),
-        tf.keras.layers.Dense(256, activation='relu'),
-        tf.keras.layers.Dense(256, activation='relu'),
-        tf.keras.layers.Dense(3, activation='softmax'),   # 3 actions: fold/call/raise
-    ])
+    import model_layers
+    # compact int8 cards + feats in, one-hot expansion inside the graph
+    model = model_layers.build_model(hidden=(256, 256))
 
     print("4) Compile")
     model.compile(
@@ -199,3 +166,5 @@ if __name__ == "__main__":
     )
 
     model.save('poker_bot_200.h5')
+    import numpy_model
+    numpy_model.export('poker_bot_200.h5', 'poker_bot_200.npz')   # for TF-free inference
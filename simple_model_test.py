@@ -1,39 +1,33 @@
 import re
 import numpy as np
 import random
-import tensorflow as tf
 from treys import Deck, Evaluator, Card
 from pypokerengine.api.game import setup_config, start_poker
 from pypokerengine.players import BasePokerPlayer
 from ppe_bot import to_treys
+import features
+import numpy_model
 # —————————————————————————————
 # 1) Load your trained model
 # —————————————————————————————
-model = tf.keras.models.load_model('poker_bot.h5')
+# NumPy forward pass, no TensorFlow import; uses poker_bot.npz if it has been exported
+# (python numpy_model.py poker_bot.h5). A Keras model works here too.
+model = numpy_model.load_model('poker_bot.h5')
 
 # —————————————————————————————
 # 2) State-encoding helpers
 # —————————————————————————————
-RANKS = '23456789TJQKA'
-SUITS = 'HDCS'
-ALL_CARDS = [s + r for r in RANKS for s in SUITS]
-card_to_idx = {c: i for i, c in enumerate(ALL_CARDS)}
-
 bot_stats = {"fold": 0, "call": 0, "raise": 0}
 
-def cards_to_onehot(cards):
-    vec = np.zeros(len(ALL_CARDS), dtype=np.float32)
-    for c in cards:
-        vec[card_to_idx[c]] = 1.0
-    return vec
+def encode_compact(hole, board, pot, hero_stack, opp_stack):
+    # the features.py encoding simple_model.py trains on, as a batch of one
+    return features.encode_batch([features.card_indices(hole, features.HOLE_SLOTS)],
+                                 [features.card_indices(board, features.BOARD_SLOTS)],
+                                 [pot], [hero_stack], [opp_stack])
 
 def encode_state(hole, board, pot, hero_stack, opp_stack):
     # hole & board one-hots, plus numeric feats
-    hole_oh = cards_to_onehot(hole)
-    board_padded = board + ['']*(5-len(board))
-    board_oh = cards_to_onehot([c for c in board_padded if c])
-    feats = np.array([pot, hero_stack, opp_stack, len(board)], dtype=np.float32)
-    return np.concatenate([hole_oh, board_oh, feats])
+    return features.expand(*encode_compact(hole, board, pot, hero_stack, opp_stack))[0]
 
 # —————————————————————————————
 # 3) ModelPlayer wrapper
@@ -52,8 +46,8 @@ class ModelPlayer(BasePokerPlayer):
         # opponent stack ≈ total pot + blinds*2 – hero_contrib
         opp_stack = pot + 5*2 - hero_contrib
         community_cards = round_state['community_card']
-        state = encode_state(hole_card, community_cards, pot, hero_contrib, opp_stack)
-        probs = self.model.predict(state[np.newaxis])[0]
+        cards, feats = encode_compact(hole_card, community_cards, pot, hero_contrib, opp_stack)
+        probs = self.model.predict(features.model_inputs(self.model, cards, feats))[0]
         print(probs)
         # target_action = ['fold','call','raise'][np.argmax(probs)]
         target_action = np.random.choice(['fold', 'call', 'raise'], p=probs)